@@ -3,11 +3,65 @@ await function(*args, **memory) -> this doesn't work because :
     - it is not generic and will break whenever a function doesn't take **kwargs
     - kwargs itself is a copy and will break reference
 """
-from typing import Any, Callable, List
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Tuple, Union
+from concurrent.futures import (
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    ProcessPoolExecutor,
+)
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
 
-import inspect, logging, asyncio
+import inspect, logging, asyncio, weakref, time
+
+from aiosow.shared import THRESHOLD, share, attach, release, call_shared
 
 ALIASES = {}
+ALIAS_DEPENDENCIES = {}
+# name -> (cache, reads) of aliases registered with a cache mode
+ALIAS_POLICIES = {}
+# name -> (expiration, future) of aliases cached with a ttl or reads
+ALIAS_VALUES = {}
+# name -> (expiration, future) of aliases cached for the current perpetuation
+CYCLE: ContextVar = ContextVar("aiosow_alias_cycle", default=None)
+
+# sources of a parameter value in a `CallPlan`
+MEMORY, ALIASED, FILLED = range(3)
+
+PLANS = weakref.WeakKeyDictionary()
+
+# name -> (processes, max_workers) of the executors declared with `executor`
+EXECUTOR_DECLARATIONS = {}
+# name -> running executor
+EXECUTORS = {}
+
+
+class CallPlan(NamedTuple):
+    """
+    Compiled prototype of a function, computed once by `compile_plan` so that
+    `fill_prototype` only has to do memory lookups.
+
+    - name: name used in logs
+    - wrapped: the function is decorated and receives its arguments unchanged
+    - slots: `(name, default, source)` of every positional parameter
+    - keywords: `(name, default, source)` of every keyword-only parameter
+    - varargs: the function takes `*args`
+    - varkw: the function takes `**kwargs`
+    - aliases: levels of aliases to resolve before the call, see `alias_levels`
+    - sync: the function and all its aliases are synchronous and uncached, so it
+        can be called with `autofill_sync`
+    """
+
+    name: str
+    wrapped: bool
+    slots: Tuple
+    keywords: Tuple
+    varargs: bool
+    varkw: bool
+    aliases: Tuple
+    sync: bool
 
 
 def get_aliases():  # pragma: no cover
@@ -18,9 +72,15 @@ def get_aliases():  # pragma: no cover
 def reset_aliases():  # pragma: no cover
     global ALIASES
     ALIASES = {}
+    ALIAS_DEPENDENCIES.clear()
+    ALIAS_POLICIES.clear()
+    ALIAS_VALUES.clear()
+    PLANS.clear()
 
 
-def alias(name: str):
+def alias(
+    name: str, cache: Union[str, float, None] = None, reads: Iterable[str] = ()
+):
     """
     The alias function is a decorator that can be used to inject a value for a
     function argument that will be passed to the autofill function.
@@ -33,21 +93,176 @@ def alias(name: str):
     The registered alias function will be called and its result will be used as
     the argument value.
 
+    An alias may itself take aliased arguments. Aliases which don't depend on
+    each other are resolved concurrently, and registering an alias that would
+    end up depending on itself raises a `ValueError`.
+
+    By default an alias is called on every autofill. Expensive aliases can opt
+    in a cache:
+    - `cache="cycle"` : called once per `perpetuate` cycle, that is the top
+        level `perpetuate` call and every handler it triggers.
+    - `cache=seconds` : the value is kept `seconds` seconds.
+    - `reads=[keys]` : the value is kept until one of `keys` is perpetuated.
+        It can be combined with both modes above.
+
     **Args**:
     - name (str): The name of the argument to inject a value for.
+    - cache (str|float|None, optional): Cache mode. Defaults to None.
+    - reads (Iterable[str], optional): Memory keys invalidating the cached
+        value. Defaults to ().
 
     **Returns**:
     - Callable: A decorator that takes a function as input, registers it to have
       an injected argument with the given name, and returns the function unchanged.
     """
 
+    if not (cache is None or cache == "cycle" or isinstance(cache, (int, float))):
+        raise ValueError(f"unknown alias cache mode : {cache}")
+    reads = frozenset(reads)
+
     def decorator(function: Callable):
+        aliases = {**ALIASES, name: function}
+        dependencies = {}
+        for aliased, aliased_function in aliases.items():
+            plan = compile_plan(aliased_function)
+            dependencies[aliased] = frozenset(
+                slot_name
+                for slot_name, __default__, source in plan.slots + plan.keywords
+                if source != MEMORY and slot_name in aliases
+            )
+        cycle = find_cycle(dependencies)
+        if cycle:
+            raise ValueError(f"alias cycle : {' -> '.join(cycle)}")
         ALIASES[name] = function
+        ALIAS_DEPENDENCIES.clear()
+        ALIAS_DEPENDENCIES.update(dependencies)
+        ALIAS_POLICIES.pop(name, None)
+        if cache is not None or reads:
+            ALIAS_POLICIES[name] = (cache, reads)
+        invalidate_aliases(names=[name])
+        PLANS.clear()
         return function
 
     return decorator
 
 
+def find_cycle(dependencies: Dict) -> List:
+    """
+    Returns a path `[a, b, ..., a]` if the dependency graph contains a cycle,
+    an empty list otherwise.
+    """
+    visited = set()
+
+    def visit(name: str, path: List) -> List:
+        if name in path:
+            return path[path.index(name) :] + [name]
+        if name in visited:
+            return []
+        visited.add(name)
+        for dependency in dependencies.get(name, ()):
+            cycle = visit(dependency, path + [name])
+            if cycle:
+                return cycle
+        return []
+
+    for name in dependencies:
+        cycle = visit(name, [])
+        if cycle:
+            return cycle
+    return []
+
+
+def alias_levels(names) -> Tuple:
+    """
+    Groups `names` and the aliases they depend on into levels: every alias of a
+    level only depends on aliases of previous levels, so the aliases of a level
+    can be resolved concurrently.
+    """
+    pending, stack = set(), list(names)
+    while stack:
+        name = stack.pop()
+        if name not in pending:
+            pending.add(name)
+            stack.extend(ALIAS_DEPENDENCIES.get(name, ()))
+    levels, done = [], set()
+    while pending:
+        level = tuple(
+            sorted(
+                name
+                for name in pending
+                if ALIAS_DEPENDENCIES.get(name, frozenset()) <= done
+            )
+        )
+        levels.append(level)
+        done.update(level)
+        pending.difference_update(level)
+    return tuple(levels)
+
+
+def compile_plan(function: Callable) -> CallPlan:
+    """
+    Inspects the prototype of `function` and returns its `CallPlan`.
+    """
+    if hasattr(function, "__wrapped__"):
+        return CallPlan(
+            function.__wrapped__.__name__, True, (), (), False, False, (), False
+        )
+    slots, keywords, varargs, varkw = [], [], False, False
+    for param_name, param in inspect.signature(function).parameters.items():
+        if param.kind == inspect.Parameter.VAR_POSITIONAL:
+            varargs = True
+        elif param.kind == inspect.Parameter.VAR_KEYWORD:
+            varkw = True
+        else:
+            slot = (
+                param_name,
+                None if param.default is inspect.Parameter.empty else param.default,
+                MEMORY
+                if param_name == "memory"
+                else ALIASED
+                if param_name in ALIASES
+                else FILLED,
+            )
+            if param.kind == inspect.Parameter.KEYWORD_ONLY:
+                keywords.append(slot)
+            else:
+                slots.append(slot)
+    levels = alias_levels(
+        name for name, __default__, source in slots + keywords if source == ALIASED
+    )
+    return CallPlan(
+        getattr(function, "__name__", None) or str(function),
+        False,
+        tuple(slots),
+        tuple(keywords),
+        varargs,
+        varkw,
+        levels,
+        not inspect.iscoroutinefunction(function)
+        and not inspect.iscoroutinefunction(getattr(function, "__call__", None))
+        and all(
+            name not in ALIAS_POLICIES and get_call_plan(ALIASES[name]).sync
+            for level in levels
+            for name in level
+        ),
+    )
+
+
+def get_call_plan(function: Callable) -> CallPlan:
+    """
+    Returns the cached `CallPlan` of `function`, compiling it on first use.
+    Plans are dropped with the function they describe and whenever an alias
+    is registered.
+    """
+    try:
+        return PLANS[function]
+    except KeyError:
+        plan = PLANS[function] = compile_plan(function)
+        return plan
+    except TypeError:  # not weak-referenceable
+        return compile_plan(function)
+
+
 async def fill_prototype(function: Callable, args: Any = [], **kwargs) -> Any:
     """
     The autofill function takes a callable function, args, and memory as input
@@ -68,66 +283,174 @@ async def fill_prototype(function: Callable, args: Any = [], **kwargs) -> Any:
 
     - If the input function has been decorated, this function will unwrap the
         original function and use its signature to determine the arguments.
+
+    - The prototype of the input function is inspected once and cached as a
+        `CallPlan` (see `get_call_plan`).
     """
+    plan = get_call_plan(function)
+    if plan.wrapped:
+        return (plan.name, args, kwargs)
     memory = kwargs.get("memory", {})
+    resolved = await resolve_aliases(plan.aliases, memory) if plan.aliases else {}
+    given_args, kws = bind(plan, args, kwargs, memory, resolved)
+    return (plan.name, given_args, kws)
 
-    def prototype(function: Callable) -> List:
-        return [
-            (
-                param_name,
-                None
-                if param.default is inspect.Parameter.empty
-                else param.default,
-            )
-            for param_name, param in inspect.signature(
-                function
-            ).parameters.items()
-            if param.kind != inspect.Parameter.VAR_KEYWORD
-            and param.kind != inspect.Parameter.VAR_POSITIONAL
-        ]
-
-    class Sentinel:
-        """Used to represent element to be deleted"""
-
-    def none_to_empty(el):  # pragma: no cover
-        if el == None:
-            return []
+
+def bind(plan: CallPlan, args: Any, kwargs: Dict, memory: Any, resolved: Dict):
+    """
+    Builds the positional and keyword arguments described by `plan`, taking
+    aliased values from `resolved`.
+    """
+    position, count = 0, len(args)
+    given_args = []
+    for name, default, source in plan.slots:
+        if source == MEMORY:
+            given_args.append(memory)
+        elif source == ALIASED:
+            given_args.append(resolved[name])
+        elif position < count:
+            given_args.append(args[position])
+            position += 1
         else:
-            return el
+            given_args.append(memory.get(name, default))
+    if plan.varargs:
+        given_args.extend(args[position:])
+    kws = kwargs if plan.varkw else {}
+    if plan.keywords:
+        kws = dict(kws)
+        for name, default, source in plan.keywords:
+            kws[name] = (
+                memory
+                if source == MEMORY
+                else resolved[name]
+                if source == ALIASED
+                else memory.get(name, default)
+            )
+    return given_args, kws
 
-    argscopy = list(args)
-    if hasattr(function, "__wrapped__"):
-        given_args = args
-        kws = kwargs
-        name = function.__wrapped__.__name__
-    else:
-        name = getattr(function, "__name__", None) or str(function)
-        kws = kwargs if inspect.getfullargspec(function).varkw else {}
-        prot = prototype(function)
-        given_args = [
-            memory
-            if name == "memory"
-            else await autofill(ALIASES[name], args=[], memory=memory)
-            if name in ALIASES
-            else argscopy.pop(0)
-            if len(argscopy) > 0
-            else (
-                memory.get(name, value)
-                if not name
-                in none_to_empty(inspect.getfullargspec(function).varkw)
-                else Sentinel
+
+@contextmanager
+def alias_cycle():
+    """
+    Opens the scope of aliases registered with `cache="cycle"`, unless one is
+    already opened. Used by `aiosow.perpetuate.perpetuate`.
+    """
+    if CYCLE.get() is not None:
+        yield
+        return
+    token = CYCLE.set({})
+    try:
+        yield
+    finally:
+        CYCLE.reset(token)
+
+
+def invalidate_aliases(keys: Iterable[str] = (), names: Iterable[str] = ()):
+    """
+    Drops the cached values of the aliases named `names`, of the aliases
+    reading one of the memory `keys` and of every alias depending on them.
+    """
+    if not ALIAS_POLICIES:
+        return
+    keys = set(keys)
+    invalid = set(names) | {
+        name for name, (__cache__, reads) in ALIAS_POLICIES.items() if reads & keys
+    }
+    stack = list(invalid)
+    while stack:
+        name = stack.pop()
+        for dependent, dependencies in ALIAS_DEPENDENCIES.items():
+            if name in dependencies and dependent not in invalid:
+                invalid.add(dependent)
+                stack.append(dependent)
+    cycle = CYCLE.get()
+    for name in invalid:
+        ALIAS_VALUES.pop(name, None)
+        if cycle is not None:
+            cycle.pop(name, None)
+
+
+async def resolve_alias(name: str, memory: Any, resolved: Dict) -> Any:
+    """
+    Returns the value of the alias `name`, from its cache when it has one.
+    Concurrent resolutions of a cached alias share a single call.
+    """
+    policy = ALIAS_POLICIES.get(name)
+    if policy is None:
+        return await call_alias(name, memory, resolved)
+    cache, __reads__ = policy
+    store = CYCLE.get() if cache == "cycle" else ALIAS_VALUES
+    if store is None:
+        return await call_alias(name, memory, resolved)
+    cached = store.get(name)
+    if cached and cached[0] > time.monotonic():
+        return await asyncio.shield(cached[1])
+    # the call runs in its own task, so that cancelling the resolution that
+    # started it doesn't cancel the others
+    task = asyncio.ensure_future(call_alias(name, memory, resolved))
+    expiration = (
+        time.monotonic() + cache if isinstance(cache, (int, float)) else float("inf")
+    )
+    store[name] = (expiration, task)
+
+    def forget(task):
+        if task.cancelled() or task.exception() is not None:
+            if store.get(name, (None, None))[1] is task:
+                del store[name]
+
+    task.add_done_callback(forget)
+    return await asyncio.shield(task)
+
+
+def resolve_aliases_sync(levels: Tuple, memory: Any) -> Tuple[Dict, Any]:
+    """
+    Resolves synchronous aliases. If one of them returns a coroutine, stops
+    and returns it with the levels left, as `(name, coroutine, levels)`, for
+    `finish_autofill` to resolve them asynchronously.
+    """
+    resolved = {}
+    for position, level in enumerate(levels):
+        for index, name in enumerate(level):
+            function = ALIASES[name]
+            given_args, kws = bind(
+                get_call_plan(function), [], {"memory": memory}, memory, resolved
             )
-            for (name, value) in prot
-        ]
-        given_args = [arg for arg in given_args if arg != Sentinel]
-        has_varargs = any(
-            param.kind == inspect.Parameter.VAR_POSITIONAL
-            for param in inspect.signature(function).parameters.values()
-        )
-        given_args = (
-            given_args if not has_varargs else given_args + list(argscopy)
-        )
-    return (name, given_args, kws)
+            value = function(*given_args, **kws)
+            if inspect.iscoroutine(value):
+                left = (level[index + 1 :],) + levels[position + 1 :]
+                return resolved, (name, value, tuple(lvl for lvl in left if lvl))
+            resolved[name] = value
+    return resolved, None
+
+
+async def call_alias(name: str, memory: Any, resolved: Dict) -> Any:
+    function = ALIASES[name]
+    plan = get_call_plan(function)
+    kwargs = {"memory": memory}
+    given_args, kws = (
+        ([], kwargs) if plan.wrapped else bind(plan, [], kwargs, memory, resolved)
+    )
+    result = function(*given_args, **kws)
+    return await result if inspect.iscoroutine(result) else result
+
+
+async def resolve_aliases(
+    levels: Tuple, memory: Any, resolved: Union[Dict, None] = None
+) -> Dict:
+    """
+    Resolves the aliases of a `CallPlan` level by level, each alias being
+    called once and the aliases of a level concurrently.
+    """
+    resolved = {} if resolved is None else resolved
+    for level in levels:
+        if len(level) == 1:
+            resolved[level[0]] = await resolve_alias(level[0], memory, resolved)
+        else:
+            values = await asyncio.gather(
+                *[resolve_alias(name, memory, resolved) for name in level]
+            )
+            resolved.update(zip(level, values))
+    return resolved
 
 
 def get_function_representation(function):
@@ -158,26 +481,233 @@ async def autofill(function: Callable, args: Any = [], **kwargs) -> Any:
         raise (err)  # `debug` needs `autofill` to raise
 
 
-def make_async(function: Callable) -> Callable:
+def is_sync(function: Callable) -> bool:
+    """
+    Whether `function` can be called with `autofill_sync`.
+    """
+    return get_call_plan(function).sync
+
+
+def autofill_sync(function: Callable, args: Any = [], **kwargs) -> Any:
+    """
+    Synchronous counterpart of `autofill`, skipping the coroutine machinery
+    for functions whose `CallPlan` is `sync` (see `is_sync`). The result is
+    returned as is, so callers must await it when it is a coroutine: the
+    function returned one, or one of its aliases did and the call is then
+    completed asynchronously.
+
+    **Raises**:
+    - TypeError: if the function or one of its aliases is asynchronous.
+    """
+    plan = get_call_plan(function)
+    if not plan.sync:
+        raise TypeError(f"{plan.name} can't be autofilled synchronously")
+    memory = kwargs.get("memory", {})
+    resolved = {}
+    if plan.aliases:
+        resolved, pending = resolve_aliases_sync(plan.aliases, memory)
+        if pending:
+            return finish_autofill(plan, function, args, kwargs, resolved, pending)
+    given_args, kws = bind(plan, args, kwargs, memory, resolved)
+    try:
+        if memory.get("log_autofill", False):  # pragma: no cover
+            function_representation = get_function_representation(function)
+            logging.info(f" -> {function_representation}")
+        return function(*given_args, **kws)
+    except Exception as err:  # pragma: no cover
+        logging.error(f"{plan.name} : {err}")
+        logging.debug(f" > error generated by calling {plan.name}({given_args})")
+        raise (err)
+
+
+async def autofill_fast(function: Callable, args: Any = [], **kwargs) -> Any:
+    """
+    Autofills `function` with `autofill_sync` when it can (see `is_sync`),
+    with `autofill` otherwise, and returns its awaited result.
+    """
+    if is_sync(function):
+        result = autofill_sync(function, args=args, **kwargs)
+        return await result if inspect.iscoroutine(result) else result
+    return await autofill(function, args=args, **kwargs)
+
+
+async def finish_autofill(
+    plan: CallPlan,
+    function: Callable,
+    args: Any,
+    kwargs: Dict,
+    resolved: Dict,
+    pending: Tuple,
+) -> Any:
+    """
+    Completes an `autofill_sync` call interrupted by an alias returning a
+    coroutine.
+    """
+    name, coroutine, levels = pending
+    memory = kwargs.get("memory", {})
+    resolved[name] = await coroutine
+    await resolve_aliases(levels, memory, resolved)
+    given_args, kws = bind(plan, args, kwargs, memory, resolved)
+    result = function(*given_args, **kws)
+    return await result if inspect.iscoroutine(result) else result
+
+
+def executor(name: str, max_workers: Union[int, None] = None, processes=False):
+    """
+    Declares a named executor that `make_async` bindings can share. It is
+    started on first use and shut down by `shutdown_executors`, which
+    `aiosow.command.run` calls on exit.
+
+    **Args**:
+    - name (str): The name used with `make_async(executor=name)`.
+    - max_workers (int|None, optional): Size of the pool. Defaults to None,
+        which lets `concurrent.futures` pick it.
+    - processes (bool, optional): Use a `ProcessPoolExecutor` instead of a
+        `ThreadPoolExecutor`. Defaults to False.
+
+    **Example**:
+    ```
+    executor("database", max_workers=2)
+    executor("compute", processes=True)
+
+    query = make_async(executor="database")(implementation.query)
+    ```
+    """
+    running = EXECUTORS.pop(name, None)
+    if running:
+        running.shutdown(wait=False)
+    EXECUTOR_DECLARATIONS[name] = (processes, max_workers)
+
+
+def get_executor(name: str) -> Executor:
+    """
+    Returns the executor named `name`, starting it if needed. Names which were
+    not declared with `executor` get a default `ThreadPoolExecutor`.
+    """
+    if name not in EXECUTORS:
+        processes, max_workers = EXECUTOR_DECLARATIONS.get(name, (False, None))
+        EXECUTORS[name] = (
+            ProcessPoolExecutor(max_workers)
+            if processes
+            else ThreadPoolExecutor(max_workers, thread_name_prefix=f"aiosow-{name}")
+        )
+    return EXECUTORS[name]
+
+
+def shutdown_executors(wait: bool = True):
+    """
+    Shuts down every executor started by `get_executor`.
+    """
+    for running in EXECUTORS.values():
+        running.shutdown(wait=wait)
+    EXECUTORS.clear()
+
+
+def make_async(
+    function: Union[Callable, None] = None,
+    executor: Union[str, Executor, None] = None,
+    shared: Union[bool, int] = False,
+) -> Callable:
     """
     Make a synchronous function run in it's own thread
     using `run_in_executor`.
 
+    Without `executor` the loop's default executor is used, which is shared by
+    every binding. `executor` can be the name of an executor declared with
+    `aiosow.autofill.executor` or an `Executor` instance.
+
+    With a `ProcessPoolExecutor` only the autofilled arguments are sent to the
+    worker: `memory` is never shipped, and a function taking a `memory`
+    argument raises a `ValueError`. The function has to be picklable, which is
+    the case of a function defined in an implementation module and bound with
+    `make_async(executor=...)(implementation.function)`.
+
+    With `shared` and a `ProcessPoolExecutor`, buffers (`bytes`, `bytearray`,
+    `memoryview`, `array`) of at least `shared` bytes (64KiB with `True`) are
+    passed through memory-mapped files instead of being pickled, see
+    `aiosow.shared`. They are received with their type on both ends, for the
+    arguments as for the result or the values of the mutation it returns: a
+    `memoryview` is mapped in place, without a copy, the other types are
+    copied once out of the mapping.
+
     **args**:
     - function: Callable
+    - executor: str|Executor|None
+    - shared: bool|int
 
     **returns**:
     - Async Callable
+
+    **Example**:
+    ```
+    @make_async
+    def blocking(): ...
+
+    compute = make_async(executor="compute")(implementation.compute)
+    ```
     """
+    if function is None:
+        return partial(make_async, executor=executor, shared=shared)
+    threshold = THRESHOLD if shared is True else shared
 
     async def wrapper(*args, **kwargs):
         loop = asyncio.get_event_loop()
-        __name__, given_args, kws = await fill_prototype(
-            function, args=args, **kwargs
-        )
-        return await loop.run_in_executor(None, function, *given_args, **kws)
+        name, given_args, kws = await fill_prototype(function, args=args, **kwargs)
+        pool = get_executor(executor) if isinstance(executor, str) else executor
+        if isinstance(pool, ProcessPoolExecutor):
+            plan = get_call_plan(function)
+            if any(slot[2] == MEMORY for slot in plan.slots + plan.keywords):
+                raise ValueError(f"{name} : memory can't be sent to a process")
+            kws = {key: value for key, value in kws.items() if key != "memory"}
+            if threshold:
+                return await call_in_process(pool, function, given_args, kws, threshold)
+        return await loop.run_in_executor(pool, partial(function, *given_args, **kws))
 
     return wrapper
 
 
-__all__ = ["alias", "autofill", "make_async", "fill_prototype"]
+async def call_in_process(
+    pool: Executor, function: Callable, args: List, kwargs: Dict, threshold: int
+) -> Any:
+    """
+    Calls `function` in `pool` with its large buffers shared, see `aiosow.shared`.
+    """
+    args = [share(arg, threshold) for arg in args]
+    kwargs = {key: share(value, threshold) for key, value in kwargs.items()}
+    shared = args + list(kwargs.values())
+
+    def discard(future: Future):
+        # nobody attaches the buffers of a cancelled call
+        for value in shared:
+            release(value)
+        if not future.cancelled() and future.exception() is None:
+            result = future.result()
+            for value in result.values() if isinstance(result, dict) else [result]:
+                release(value)
+
+    future = pool.submit(call_shared, function, args, kwargs, threshold)
+    try:
+        result = await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # the worker may still be running: cleans up once it's done
+        future.add_done_callback(discard)
+        raise
+    except Exception:
+        discard(future)
+        raise
+    for value in shared:
+        release(value)
+    if isinstance(result, dict):
+        return {key: attach(value, unlink=True) for key, value in result.items()}
+    return attach(result, unlink=True)
+
+
+__all__ = [
+    "alias",
+    "autofill",
+    "autofill_sync",
+    "autofill_fast",
+    "executor",
+    "make_async",
+    "fill_prototype",
+]
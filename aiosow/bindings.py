@@ -2,15 +2,46 @@ from typing import Tuple, Callable, Any, Union
 
 import pdb as _pdb
 import asyncio
+import logging
+import sys
 import time
 import inspect
+from array import array
+from collections import deque
 from functools import wraps
 
-from aiosow.autofill import autofill, alias, make_async
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from aiosow.autofill import (
+    autofill,
+    autofill_fast,
+    alias,
+    executor,
+    make_async,
+)
+from aiosow.limiters import AdaptiveLimiter, RateLimiter
 from aiosow.options import option
-from aiosow.perpetuate import on, perpetuate
+from aiosow.perpetuate import (
+    on,
+    perpetuate,
+    perpetuate_many,
+    transaction,
+    concurrent_dispatch,
+    detect_changes,
+    scheduler,
+)
 from aiosow.setup import setup
 
+# (flush, function) of every accumulator, see `flush_accumulators`
+ACCUMULATORS = []
+# tasks flushing accumulators after their `max_wait`
+ACCUMULATOR_TASKS = set()
+# values of a partitioned wire waiting for delivery, unless `queue_size` is set
+PARTITION_BACKLOG = 1024
+
 
 def adapter(resolve: Callable) -> Callable:
     """
@@ -68,7 +99,14 @@ def until_success():
     return retry_until_success
 
 
-def wire(condition=None, perpetual=False, pass_args=True) -> Tuple[Callable, Callable]:
+def wire(
+    condition=None,
+    perpetual=False,
+    pass_args=True,
+    max_concurrency: Union[int, None] = None,
+    queue_size: Union[int, None] = None,
+    partition_key: Union[Callable, None] = None,
+) -> Tuple[Callable, Callable]:
     """
     Returns a tuple of two decorators: `trigger_decorator` and `listen_decorator`.
 
@@ -123,21 +161,184 @@ def wire(condition=None, perpetual=False, pass_args=True) -> Tuple[Callable, Cal
     > my_function_called with 1
     ```
 
+    The trigger can also be an async generator: every value it yields is
+    delivered to the listeners as soon as it is produced and the generator
+    is resumed once they are done, or, with `max_concurrency`, once the
+    calls are queued. If the trigger call is cancelled or a listener fails,
+    the generator is closed.
+
+    **Args**:
+    - max_concurrency (int|None, optional): Listeners are called by a pool of
+        `max_concurrency` workers instead of a task per call, and a generator
+        is consumed at the pace of the workers. Defaults to None (a task per
+        call).
+    - queue_size (int|None, optional): With `max_concurrency`, number of calls
+        waiting for a worker before the generator is paused. Defaults to
+        `max_concurrency`. With `partition_key`, number of values waiting in
+        all the partitions before triggers are paused. Defaults to
+        `PARTITION_BACKLOG`.
+    - partition_key (Callable|None, optional): Autofilled with every value to
+        get its partition. The values of a partition are delivered one after the
+        other in the order they are triggered, even across trigger calls,
+        while partitions run in parallel. `max_concurrency` then bounds the
+        number of partitions delivering at once. The number of values waiting
+        in each partition is returned by the `depths()` attribute of the
+        trigger decorator. Cancelling a trigger call doesn't withdraw the
+        values it queued. Defaults to None.
+
     **Returns**:
     - A tuple of two decorators: `trigger_decorator` and `listen_decorator`.
     """
     listeners = []
+    # partition -> deque of the values waiting for delivery, the first one
+    # being delivered
+    partitions = {}
+    # acquired by every value pushed to a partition, released once delivered
+    backlog = asyncio.Semaphore(queue_size or PARTITION_BACKLOG)
+    # tasks delivering the values of a partition
+    consumers = set()
+    semaphore = (
+        asyncio.Semaphore(max_concurrency)
+        if partition_key and max_concurrency
+        else None
+    )
     caster = autofill if not perpetual else perpetuate
 
+    async def fan_out(values, kwargs):
+        queue = asyncio.Queue(queue_size or max_concurrency)
+        errors = []
+
+        async def worker():
+            while True:
+                job = await queue.get()
+                if job is None:
+                    return
+                if errors:
+                    continue  # drains the queue so that the producer can't block
+                try:
+                    await caster(job[0], args=job[1], **kwargs)
+                except Exception as err:
+                    errors.append(err)
+
+        async def put(val):
+            for func in listeners:
+                if func:
+                    await queue.put((func, [val] if pass_args else []))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(max_concurrency)]
+        try:
+            if inspect.isasyncgen(values):
+                async for val in values:
+                    if errors:
+                        break
+                    await put(val)
+            else:
+                for val in values:
+                    if errors:
+                        break
+                    await put(val)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        if errors:
+            raise errors[0]
+
+    async def partitioned(values, kwargs):
+        futures = []
+
+        async def push(val):
+            key = await autofill_fast(partition_key, args=[val], **kwargs)
+            await backlog.acquire()
+            future = asyncio.get_running_loop().create_future()
+            queue = partitions.get(key)
+            if queue is None:
+                queue = partitions[key] = deque()
+                task = asyncio.ensure_future(consume(key, queue))
+                consumers.add(task)
+                task.add_done_callback(consumers.discard)
+            queue.append((val, kwargs, future))
+            futures.append(future)
+
+        try:
+            if inspect.isasyncgen(values):
+                async for val in values:
+                    await push(val)
+            else:
+                for val in values:
+                    await push(val)
+        except BaseException as err:
+            # the values already pushed are delivered anyway: waits for them
+            # or, when cancelled, retrieves their errors once they are done
+            pushed = asyncio.gather(*futures, return_exceptions=True)
+            if isinstance(err, Exception):
+                await pushed
+            raise
+        for result in await asyncio.gather(*futures, return_exceptions=True):
+            if isinstance(result, BaseException):
+                raise result
+
+    async def consume(key, queue):
+        try:
+            while queue:
+                val, kwargs, future = queue[0]
+                try:
+                    if semaphore:
+                        async with semaphore:
+                            await deliver(val, kwargs)
+                    else:
+                        await deliver(val, kwargs)
+                except Exception as err:
+                    if not future.done():
+                        future.set_exception(err)
+                else:
+                    if not future.done():
+                        future.set_result(None)
+                queue.popleft()
+                backlog.release()
+        finally:
+            del partitions[key]
+
+    async def deliver(val, kwargs):
+        await asyncio.gather(
+            *[
+                caster(func, args=[val] if pass_args else [], **kwargs)
+                for func in listeners
+                if func
+            ]
+        )
+
     def trigger_decorator(triggerer):
         @wraps(triggerer)
         async def call(*args, **kwargs):
             result = await autofill(triggerer, args=args, **kwargs)
+            passed = True
+            if result and condition:
+                passed = await autofill_fast(condition, args=[], **kwargs)
             # if triggerer is a generator we need to iterate over it
-            if result and (
-                await autofill(condition, args=[], **kwargs) if condition else True
-            ):
-                if inspect.isgenerator(result):
+            if result and passed:
+                if partition_key or max_concurrency:
+                    iterated = inspect.isgenerator(result) or inspect.isasyncgen(
+                        result
+                    )
+                    dispatch = partitioned if partition_key else fan_out
+                    try:
+                        await dispatch(result if iterated else [result], kwargs)
+                    finally:
+                        if inspect.isasyncgen(result):
+                            await result.aclose()
+                    tasks = []
+                elif inspect.isasyncgen(result):
+                    tasks = []
+                    try:
+                        async for val in result:
+                            await deliver(val, kwargs)
+                    finally:
+                        await result.aclose()
+                elif inspect.isgenerator(result):
                     tasks = []
                     for val in result:
                         tasks += [
@@ -160,6 +361,11 @@ def wire(condition=None, perpetual=False, pass_args=True) -> Tuple[Callable, Cal
 
         return call
 
+    def depths() -> dict:
+        return {key: len(queue) for key, queue in partitions.items()}
+
+    trigger_decorator.depths = depths
+
     def listen_decorator(listener):
         listeners.append(listener)
         return listener
@@ -167,70 +373,214 @@ def wire(condition=None, perpetual=False, pass_args=True) -> Tuple[Callable, Cal
     return (trigger_decorator, listen_decorator)
 
 
-def accumulator(size: Union[int, Callable]) -> Callable:
+def size_of(value: Any) -> int:
+    """
+    Number of bytes of a buffer, `sys.getsizeof` of other values.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return memoryview(value).nbytes
+    return sys.getsizeof(value)
+
+
+def accumulator(
+    size: Union[int, Callable],
+    max_wait: Union[float, None] = None,
+    max_bytes: Union[int, None] = None,
+) -> Callable:
     """
     Batch the calls to a function. Triggers it when the bucket size is reached.
     If the size passed is a `Callable`, accumulator will call it with `memory`
     to get the size.
+
+    **Args**:
+    - size (int|Callable): Number of values of a batch.
+    - max_wait (float|None, optional): Seconds after which an incomplete batch
+        is passed to the function, in a task of its own. Defaults to None.
+    - max_bytes (int|None, optional): The batch is passed once its values
+        weigh `max_bytes`, see `size_of`. Defaults to None.
+
+    **Returns**:
+    - A decorator. The decorated function has a `flush` attribute, a
+        coroutine function passing the current batch right away. Batches left
+        are flushed when `aiosow.command.run` exits, see `flush_accumulators`.
     """
 
     def decorator(function: Callable) -> Callable:
         bucket = []
+        nbytes = 0
+        timer = None
+        last_kwargs = {}
+
+        async def flush(**kwargs) -> Any:
+            nonlocal bucket, nbytes, timer
+            if timer is not None:
+                timer.cancel()
+                timer = None
+            if not bucket:
+                return None
+            # swapped before awaiting: calls made meanwhile fill a new bucket
+            argument, bucket, nbytes = bucket, [], 0
+            return await autofill(function, args=[argument], **(kwargs or last_kwargs))
+
+        def expire():
+            nonlocal timer
+            timer = None
+            task = asyncio.ensure_future(flush_logged(flush, function))
+            ACCUMULATOR_TASKS.add(task)
+            task.add_done_callback(ACCUMULATOR_TASKS.discard)
 
         async def execute(*args, **kwargs) -> Any:
-            nonlocal bucket
+            nonlocal bucket, nbytes, timer, last_kwargs
+            last_kwargs = kwargs
             if isinstance(size, Callable):
                 _size = size(kwargs.get("memory", {}))
             else:
                 _size = size
             bucket += args
-            if len(bucket) >= _size:
-                argument = bucket
-                bucket = []
-                return await autofill(function, args=[argument], **kwargs)
+            if max_bytes is not None:
+                nbytes += sum(size_of(arg) for arg in args)
+            if len(bucket) >= _size or (max_bytes is not None and nbytes >= max_bytes):
+                return await flush(**kwargs)
+            if max_wait is not None and timer is None and bucket:
+                timer = asyncio.get_running_loop().call_later(max_wait, expire)
+
+        execute.flush = flush
+        ACCUMULATORS.append((flush, function))
+        return execute
+
+    return decorator
+
+
+def array_accumulator(
+    size: int,
+    typecode: str = "d",
+    max_wait: Union[float, None] = None,
+    use_numpy: bool = False,
+) -> Callable:
+    """
+    Batch numeric values in preallocated `array.array` buffers instead of a
+    list. The function receives a `memoryview` on the filled part of the
+    buffer, or a NumPy array sharing it with `use_numpy`: no copy is made.
 
+    Two buffers are used in turn so that values keep being accumulated while
+    the function processes the previous batch. The view is only valid during
+    the call: the buffer is reused afterwards.
+
+    **Args**:
+    - size (int): Number of values of a batch.
+    - typecode (str, optional): Type of the values, see `array.array`.
+        Defaults to "d" (float).
+    - max_wait (float|None, optional): See `accumulator`. Defaults to None.
+    - use_numpy (bool, optional): Passes a `numpy.ndarray`. Defaults to False.
+
+    **Returns**:
+    - A decorator, the decorated function has a `flush` attribute as with
+        `accumulator`.
+    """
+    if use_numpy and numpy is None:  # pragma: no cover
+        raise ValueError("use_numpy requires numpy")
+
+    def decorator(function: Callable) -> Callable:
+        buffers = [array(typecode, [0]) * size for _ in range(2)]
+        # future of the call processing each buffer
+        processing = [None, None]
+        active = 0
+        count = 0
+        timer = None
+        last_kwargs = {}
+
+        async def pass_batch(length: int, kwargs: dict) -> Any:
+            nonlocal active, count, timer
+            if timer is not None:
+                timer.cancel()
+                timer = None
+            filled = active
+            active, count = 1 - active, 0
+            done = asyncio.get_running_loop().create_future()
+            processing[filled] = done
+            try:
+                if use_numpy:  # pragma: no cover
+                    batch = numpy.frombuffer(
+                        buffers[filled], dtype=typecode, count=length
+                    )
+                else:
+                    batch = memoryview(buffers[filled])[:length]
+                return await autofill(function, args=[batch], **kwargs)
+            finally:
+                processing[filled] = None
+                done.set_result(None)
+
+        async def flush(**kwargs) -> Any:
+            if not count:
+                return None
+            return await pass_batch(count, kwargs or last_kwargs)
+
+        def expire():
+            nonlocal timer
+            timer = None
+            task = asyncio.ensure_future(flush_logged(flush, function))
+            ACCUMULATOR_TASKS.add(task)
+            task.add_done_callback(ACCUMULATOR_TASKS.discard)
+
+        async def execute(*args, **kwargs) -> Any:
+            nonlocal count, timer, last_kwargs
+            last_kwargs = kwargs
+            result = None
+            for value in args:
+                # the buffer is still processed: waits for it to be released
+                while processing[active] is not None:
+                    await asyncio.shield(processing[active])
+                buffers[active][count] = value
+                count += 1
+                if count == size:
+                    result = await pass_batch(size, kwargs)
+            if max_wait is not None and timer is None and count:
+                timer = asyncio.get_running_loop().call_later(max_wait, expire)
+            return result
+
+        execute.flush = flush
+        ACCUMULATORS.append((flush, function))
         return execute
 
     return decorator
 
 
+async def flush_logged(flush: Callable, function: Callable):
+    try:
+        await flush()
+    except Exception as err:
+        logging.error(f"accumulated call of {function} : {err}")
+
+
+async def flush_accumulators():
+    """
+    Passes the batches left in every accumulator to their function and waits
+    for the batches passed by `max_wait` timers.
+    """
+    for flush, function in ACCUMULATORS:
+        await flush_logged(flush, function)
+    while ACCUMULATOR_TASKS:
+        await asyncio.gather(*ACCUMULATOR_TASKS)
+
+
 def call_limit(seconds):
     """
     A decorator that limits the frequency of function calls based on the number
-    of seconds specified in the decorator parameter.
+    of seconds specified in the decorator parameter. Concurrent calls wait in
+    FIFO order, see `RateLimiter`.
+
+    Calls start at least `seconds` after the start of the previous one, not
+    after its end: a call lasting longer than `seconds` doesn't delay the next.
 
     **Args**:
         - seconds (int): The minimum number of seconds that must elapse between
-            function calls.
+            the starts of two function calls.
 
     **Returns**:
         - function: A decorated function that can only be called once every
             `seconds` seconds.
     """
-
-    def decorator(func):
-        last_called = 0
-
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            nonlocal last_called
-            if time.monotonic() - last_called >= seconds:
-                try:
-                    result = await autofill(func, args=args, **kwargs)
-                    last_called = time.monotonic()
-                    return result
-                except Exception as e:
-                    last_called = time.monotonic()
-                    raise e
-            else:
-                await asyncio.sleep(seconds - (time.monotonic() - last_called))
-                result = await autofill(func, args=args, **kwargs)
-                last_called = time.monotonic()
-                return result
-
-        return wrapper
-
-    return decorator
+    return RateLimiter(rate=1 / seconds if seconds > 0 else float("inf"))
 
 
 def delay(seconds: float) -> Callable:
@@ -476,19 +826,28 @@ def pdb(*__args__, **__kwargs__):  # pragma: no cover
 
 
 __all__ = [
+    "AdaptiveLimiter",
     "alias",
     "accumulator",
+    "array_accumulator",
     "autofill",
+    "concurrent_dispatch",
     "delay",
     "debug",
+    "detect_changes",
     "each",
+    "executor",
     "make_async",
     "on",
     "option",
     "pdb",
+    "RateLimiter",
     "perpetuate",
+    "perpetuate_many",
     "read_only",
+    "scheduler",
     "setup",
+    "transaction",
     "wrap",
     "wire",
 ]
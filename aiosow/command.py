@@ -4,6 +4,15 @@ import logging, asyncio, importlib, argparse, sys
 from aiosow.setup import initialize, should_trigger_routines
 from aiosow.options import options, commands
 from aiosow.routines import spawn_routine_consumer
+from aiosow.autofill import shutdown_executors
+from aiosow.perpetuate import drain, flush_handlers, stop_scheduler
+from aiosow.bindings import flush_accumulators
+from aiosow.memory import (
+    SQLiteMemory,
+    checkpoint,
+    checkpoint_periodically,
+    restore,
+)
 
 
 def load_composition(composition=None, **kwargs):
@@ -47,6 +56,22 @@ def load_composition(composition=None, **kwargs):
     parser.add_argument(
         "--log", help="Displays logs", action="store_true", default=False
     )
+    parser.add_argument(
+        "--memory_path",
+        default=None,
+        help="Persists the memory in this SQLite database",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Restores the memory from this file and checkpoints it there",
+    )
+    parser.add_argument(
+        "--checkpoint_interval",
+        default=60.0,
+        type=float,
+        help="Seconds between two checkpoints",
+    )
     try:
         if not composition:
             composition = sys.argv[1]
@@ -78,20 +103,81 @@ def load_composition(composition=None, **kwargs):
     return result
 
 
-def run(composition=None, **kwargs):
-    memory = load_composition(composition=composition, **kwargs)
+def run(composition=None, memory=None, **kwargs):
+    """
+    Runs a composition. `memory` replaces the memory dict with another
+    `MutableMapping`, such as an `aiosow.memory.SQLiteMemory`.
+
+    However it exits, including on `KeyboardInterrupt`, the deferred handlers
+    and accumulators are flushed and the queued mutations drained before the
+    memory is closed.
+    """
+    arguments = load_composition(composition=composition, **kwargs)
+    if memory is None and arguments.get("memory_path"):
+        memory = SQLiteMemory(arguments["memory_path"])
+    path = arguments.get("checkpoint")
+    if path:
+        memory = restore(path, memory)
+    if memory is None:
+        memory = arguments
+    else:
+        memory.update(arguments)
     logging.debug(memory)
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    tasks = loop.run_until_complete(initialize(memory))
-    memory["running"] = True
-    if should_trigger_routines():
-        consumer = loop.run_until_complete(spawn_routine_consumer(memory))
-        if consumer:
-            tasks = tasks + [consumer]
-    loop.run_until_complete(asyncio.gather(*tasks))
-    if memory.get("run_forever", False):
-        loop.run_forever()
+    checkpointer = None
+    running = None
+    try:
+        if path:
+            checkpointer = loop.create_task(
+                checkpoint_periodically(
+                    memory, path, arguments["checkpoint_interval"]
+                )
+            )
+        tasks = loop.run_until_complete(initialize(memory))
+        memory["running"] = True
+        if should_trigger_routines():
+            consumer = loop.run_until_complete(spawn_routine_consumer(memory))
+            if consumer:
+                tasks = tasks + [consumer]
+        running = asyncio.gather(*tasks)
+        loop.run_until_complete(running)
+        if memory.get("run_forever", False):
+            loop.run_forever()
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logging.info("interrupted, draining")
+    finally:
+        try:
+            if running is not None:
+                # stops the routines, retrieving the interruption if it's theirs
+                running.cancel()
+                loop.run_until_complete(
+                    asyncio.gather(running, return_exceptions=True)
+                )
+            loop.run_until_complete(shutdown())
+        finally:
+            if checkpointer:
+                checkpointer.cancel()
+                checkpoint(memory, path)
+            stop_scheduler()
+            left = asyncio.all_tasks(loop)
+            for task in left:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*left, return_exceptions=True))
+            shutdown_executors()
+            if hasattr(memory, "close"):
+                memory.close()
+            loop.close()
+
+
+async def shutdown():
+    """
+    Flushes the deferred handlers and the accumulators, then drains the queued
+    mutations.
+    """
+    await flush_handlers()
+    await flush_accumulators()
+    await drain()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,245 @@
+"""
+Limiters bounding how often, or how many, calls of a binding run.
+"""
+from typing import Any, Callable, Tuple, Union
+from collections import deque
+from functools import wraps
+
+import asyncio, time
+
+from aiosow.autofill import autofill, autofill_fast
+
+# latencies under it are never slow, whatever the baseline of AdaptiveLimiter
+LATENCY_FLOOR = 0.001
+# keys a RateLimiter holds before pruning the stale ones
+MAX_KEYS = 1024
+
+
+class RateLimiter:
+    """
+    Limits calls to `rate` per second, with bursts of up to `burst` calls,
+    following the generic cell rate algorithm: every call reserves the next
+    free slot and sleeps until it, so waiting calls run in FIFO order and
+    spaced by `1 / rate` instead of all waking up together.
+
+    A limiter is a decorator and can decorate several functions to share a
+    single quota.
+
+    **Args**:
+    - rate (float): Calls per second.
+    - burst (int, optional): Calls that can run at once after an idle period.
+        Defaults to 1.
+    - key (Callable|None, optional): Autofilled with the arguments of a call
+        to get the key it is limited by, each key having its own quota.
+        Defaults to None (one quota).
+
+    **Example**:
+    ```
+    api = RateLimiter(rate=10, burst=5)
+
+    @api
+    async def get_user(user_id):
+        ...
+
+    @RateLimiter(rate=1, key=lambda user_id: user_id)
+    async def notify(user_id):
+        ...
+    ```
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        key: Union[Callable, None] = None,
+        clock: Callable = time.monotonic,
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.interval = 1 / rate
+        self.tolerance = self.interval * (burst - 1)
+        self.key = key
+        self.clock = clock
+        # key -> theoretical arrival time of its next call
+        self.arrivals = {}
+        # size of `arrivals` pruned at, doubled after a prune keeping many keys
+        self.prune_at = MAX_KEYS
+
+    def reserve(self, key: Any = None) -> float:
+        """
+        Reserves the next slot of `key` and returns the seconds to wait for it.
+        """
+        now = self.clock()
+        arrivals = self.arrivals
+        if len(arrivals) > self.prune_at:
+            # keys whose slots are all free again are like new ones
+            for stale in [k for k, arrival in arrivals.items() if arrival <= now]:
+                del arrivals[stale]
+            self.prune_at = max(MAX_KEYS, 2 * len(arrivals))
+        arrival = max(arrivals.get(key, now), now)
+        arrivals[key] = arrival + self.interval
+        return max(arrival - self.tolerance - now, 0)
+
+    async def acquire(self, key: Any = None):
+        """
+        Waits for a slot of `key`.
+        """
+        delay = self.reserve(key)
+        if not delay:
+            return
+        reserved = self.arrivals[key]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # gives the slot back if no call reserved one after it
+            if self.arrivals.get(key) == reserved:
+                self.arrivals[key] = reserved - self.interval
+            raise
+
+    def __call__(self, function: Callable) -> Callable:
+        @wraps(function)
+        async def limited(*args, **kwargs):
+            key = None
+            if self.key is not None:
+                key = await autofill_fast(self.key, args=args, **kwargs)
+            await self.acquire(key)
+            return await autofill(function, args=args, **kwargs)
+
+        return limited
+
+
+class AdaptiveLimiter:
+    """
+    Limits the number of calls running at once and adapts the limit to the
+    upstream (AIMD): it grows by one every `limit` calls that succeed
+    quickly and is multiplied by `backoff` when a call fails or takes more
+    than `tolerance` times the baseline latency, the lowest latency observed
+    recently. Calls beyond the limit wait in FIFO order.
+
+    A limiter is a decorator and can decorate several functions calling the
+    same upstream. It exposes:
+    - limit: the current limit, calls run while `inflight < int(limit)`
+    - inflight: the number of running calls
+    - queued: the number of waiting calls
+    - rejections: the number of calls rejected because the queue was full
+
+    **Args**:
+    - initial_limit (int, optional): Defaults to 10.
+    - min_limit (int, optional): Defaults to 1.
+    - max_limit (int, optional): Defaults to 1000.
+    - max_queue (int|None, optional): Waiting calls beyond it are rejected
+        with `asyncio.QueueFull`. Defaults to None (unbounded).
+    - tolerance (float, optional): Defaults to 2.
+    - backoff (float, optional): Defaults to 0.9.
+    - errors (tuple, optional): Exceptions considered as a sign of overload.
+        Defaults to `(Exception,)`.
+
+    **Example**:
+    ```
+    upstream = AdaptiveLimiter(max_queue=100)
+
+    @upstream
+    async def fetch(url):
+        ...
+
+    logging.info("limit %s, queued %s", upstream.limit, upstream.queued)
+    ```
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        max_queue: Union[int, None] = None,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        errors: Tuple = (Exception,),
+        clock: Callable = time.monotonic,
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("expects 1 <= min_limit <= initial_limit <= max_limit")
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.errors = errors
+        self.clock = clock
+        self.baseline = None
+        self.inflight = 0
+        self.rejections = 0
+        self.waiters = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self.waiters)
+
+    async def acquire(self):
+        """
+        Waits for a slot, raises `asyncio.QueueFull` if the queue is full.
+        """
+        if self.inflight < int(self.limit) and not self.waiters:
+            self.inflight += 1
+            return
+        if self.max_queue is not None and len(self.waiters) >= self.max_queue:
+            self.rejections += 1
+            raise asyncio.QueueFull
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                self.waiters.remove(waiter)
+            else:  # the slot was given before the cancellation
+                self.release()
+            raise
+
+    def release(self):
+        self.inflight -= 1
+        self.wake()
+
+    def wake(self):
+        while self.waiters and self.inflight < int(self.limit):
+            self.inflight += 1
+            self.waiters.popleft().set_result(None)
+
+    def record(self, latency: float, failed: bool):
+        """
+        Adapts the limit to a call of `latency` seconds.
+        """
+        if failed or (
+            self.baseline is not None
+            and latency > max(self.baseline * self.tolerance, LATENCY_FLOOR)
+        ):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            return
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:  # slowly forgets a baseline the upstream can't reach anymore
+            self.baseline += (latency - self.baseline) * 0.01
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self.wake()
+
+    def __call__(self, function: Callable) -> Callable:
+        @wraps(function)
+        async def limited(*args, **kwargs):
+            await self.acquire()
+            start = self.clock()
+            try:
+                result = await autofill(function, args=args, **kwargs)
+            except self.errors:
+                self.record(self.clock() - start, failed=True)
+                raise
+            else:
+                self.record(self.clock() - start, failed=False)
+                return result
+            finally:
+                self.release()
+
+        return limited
+
+
+__all__ = ["AdaptiveLimiter", "RateLimiter"]
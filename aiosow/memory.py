@@ -0,0 +1,620 @@
+"""
+Memory backends: `MutableMapping`s that can replace the `memory` dict.
+
+`SQLiteMemory` persists the memory in an SQLite database so that a composition
+restarts with its previous state. It is selected with `--memory_path` or with
+`run(memory=SQLiteMemory(path))`.
+
+`BoundedMemory` expires and evicts keys according to policies declared by
+pattern.
+
+`schema` declares the hot keys of a memory, stored in slots and validated when
+written.
+
+`checkpoint` and `restore` save and load the picklable part of any memory in a
+compact binary file, see `--checkpoint`.
+"""
+from typing import Any, Callable, Iterator, Union
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import nullcontext
+from fnmatch import fnmatchcase
+
+import asyncio, copy, heapq, inspect, logging, mmap, os, pickle, sqlite3, struct
+import tempfile, threading, time
+
+from aiosow.autofill import invalidate_aliases
+
+DELETED = object()
+# checkpoint files start with it, followed by length prefixed pickled entries
+MAGIC = b"AIOSOW\x00\x01"
+LENGTH = struct.Struct("<Q")
+MISSING = object()
+
+
+class SQLiteMemory(MutableMapping):
+    """
+    A memory persisted in an SQLite database.
+
+    - Writes are write-behind: they are applied to the memory right away and a
+        background thread saves them to the database every `flush_interval`
+        seconds, in one transaction. The last write of a key wins.
+    - State is restored lazily: only the keys are read when it opens, a value
+        is unpickled the first time it is read.
+    - Read values are kept in a LRU cache of `cache_size` entries.
+    - Values that can't be pickled (tasks, sessions, ...) are kept in RAM and
+        are not restored: a restart restores the last value of the key that
+        could be saved, if any.
+    - Saving doesn't block the memory: the background thread has a
+        connection of its own and the database is in WAL mode, so that reads
+        go on while it commits. A `":memory:"` database can't be opened twice,
+        its reads wait for the commits.
+
+    **Args**:
+    - path (str): Path of the database, `":memory:"` for a private one. Keys
+        must be strings.
+    - cache_size (int, optional): Defaults to 1024.
+    - flush_interval (float, optional): Defaults to 0.5.
+
+    **Example**:
+    ```
+    memory = SQLiteMemory("state.db")
+    await perpetuate(load_users, memory=memory)
+    memory.close()
+    ```
+    """
+
+    def __init__(
+        self, path: str, cache_size: int = 1024, flush_interval: float = 0.5
+    ):
+        self.path = path
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.cache = OrderedDict()
+        # written values not saved yet, and the ones being saved
+        self.dirty = {}
+        self.writing = {}
+        # values that can't be pickled
+        self.volatile = {}
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS memory (key TEXT PRIMARY KEY, value BLOB)"
+        )
+        if path == ":memory:":
+            self.writer_connection = self.connection
+        else:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.writer_connection = sqlite3.connect(path, check_same_thread=False)
+        # every key of the memory
+        self.index = {
+            key for (key,) in self.connection.execute("SELECT key FROM memory")
+        }
+        self.wake = threading.Event()
+        self.closed = False
+        self.writer = threading.Thread(target=self.write_behind, daemon=True)
+        self.writer.start()
+
+    def __getitem__(self, key: Any) -> Any:
+        with self.lock:
+            for pending in (self.dirty, self.writing):
+                value = pending.get(key, MISSING)
+                if value is DELETED:
+                    raise KeyError(key)
+                if value is not MISSING:
+                    return value
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            if key in self.volatile:
+                return self.volatile[key]
+            if key not in self.index:
+                raise KeyError(key)
+            row = self.connection.execute(
+                "SELECT value FROM memory WHERE key = ?", (key,)
+            ).fetchone()
+            value = pickle.loads(row[0])
+            self.remember(key, value)
+            return value
+
+    def __setitem__(self, key: Any, value: Any):
+        with self.lock:
+            self.dirty[key] = value
+            self.index.add(key)
+            self.volatile.pop(key, None)
+            self.remember(key, value)
+
+    def __delitem__(self, key: Any):
+        with self.lock:
+            if key not in self.index:
+                raise KeyError(key)
+            self.index.discard(key)
+            self.dirty[key] = DELETED
+            self.cache.pop(key, None)
+            self.volatile.pop(key, None)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.index
+
+    def __iter__(self) -> Iterator:
+        return iter(list(self.index))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def remember(self, key: Any, value: Any):
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def flush(self):
+        """
+        Saves the pending writes to the database.
+        """
+        with self.lock:
+            self.writing, self.dirty = self.dirty, {}
+            writing = self.writing
+        rows, deleted = [], []
+        for key, value in writing.items():
+            if value is DELETED:
+                deleted.append((key,))
+                continue
+            try:
+                rows.append((key, pickle.dumps(value)))
+            except (pickle.PicklingError, TypeError, AttributeError) as err:
+                # the saved value of the key, if any, is kept
+                logging.debug(f"{key} is kept in RAM : {err}")
+                with self.lock:
+                    if key not in self.dirty:
+                        self.volatile[key] = value
+            except Exception as err:
+                # e.g. the value changed while it was pickled: saved next time
+                logging.warning(f"{key} is not saved yet : {err}")
+                with self.lock:
+                    self.dirty.setdefault(key, value)
+        connection = self.writer_connection
+        with self.lock if connection is self.connection else nullcontext():
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO memory VALUES (?, ?)", rows
+                )
+                connection.executemany("DELETE FROM memory WHERE key = ?", deleted)
+        with self.lock:
+            self.writing = {}
+
+    def write_behind(self):
+        while not self.closed:
+            self.wake.wait(self.flush_interval)
+            if self.dirty:
+                try:
+                    self.flush()
+                except Exception as err:  # pragma: no cover
+                    logging.error(f"write to {self.path} : {err}")
+
+    def close(self):
+        """
+        Stops the background writer, saves the pending writes and closes the
+        database.
+        """
+        self.closed = True
+        self.wake.set()
+        self.writer.join()
+        self.flush()
+        if self.writer_connection is not self.connection:
+            self.writer_connection.close()
+        self.connection.close()
+
+
+class BoundedMemory(MutableMapping):
+    """
+    A memory that expires and evicts the keys matching its policies, see
+    `policy`. Evictions can be observed with `evicted`.
+
+    **Example**:
+    ```
+    memory = BoundedMemory()
+    memory.policy("session:*", ttl=3600)
+    memory.policy("page:*", max_entries=10000)
+
+    @memory.evicted("page:*")
+    async def save_page(key, value):
+        await store(key, value)
+
+    run(memory=memory)
+    ```
+    """
+
+    def __init__(self, data: Any = None, clock: Callable = time.monotonic):
+        self.data = {}
+        self.clock = clock
+        self.policies = []
+        # key -> its policy, None when it has none
+        self.matches = {}
+        self.deadlines = {}
+        self.expirations = []  # heap of (deadline, key)
+        self.hooks = []
+        self.tasks = set()
+        if data:
+            self.update(data)
+
+    def policy(
+        self,
+        pattern: str,
+        ttl: Union[float, None] = None,
+        max_entries: Union[int, None] = None,
+    ):
+        """
+        Bounds the keys matching `pattern` (`fnmatch` syntax). A key follows
+        the first policy it matches.
+
+        **Args**:
+        - pattern (str): Pattern of the keys.
+        - ttl (float|None, optional): Seconds after which a key expires, from
+            its last write. Defaults to None.
+        - max_entries (int|None, optional): Maximum number of keys, the least
+            recently used ones are evicted beyond it. Defaults to None.
+        """
+        self.policies.append(
+            {
+                "pattern": pattern,
+                "ttl": ttl,
+                "max_entries": max_entries,
+                "keys": OrderedDict(),
+            }
+        )
+        self.matches.clear()
+        for key in list(self.data):
+            self.track(key)
+
+    def evicted(self, pattern: str = "*") -> Callable:
+        """
+        Decorator registering a function called with the key and the value of
+        every expired or evicted key matching `pattern`. A coroutine function
+        runs in a task.
+        """
+
+        def decorator(function: Callable) -> Callable:
+            self.hooks.append((pattern, function))
+            return function
+
+        return decorator
+
+    def match(self, key: Any) -> Union[dict, None]:
+        try:
+            return self.matches[key]
+        except KeyError:
+            pass
+        policy = None
+        if isinstance(key, str):
+            for candidate in self.policies:
+                if fnmatchcase(key, candidate["pattern"]):
+                    policy = candidate
+                    break
+        self.matches[key] = policy
+        return policy
+
+    def track(self, key: Any):
+        policy = self.match(key)
+        if policy is None:
+            return
+        if policy["ttl"] is not None:
+            deadline = self.clock() + policy["ttl"]
+            self.deadlines[key] = deadline
+            heapq.heappush(self.expirations, (deadline, key))
+            # rewritten keys leave outdated deadlines behind
+            if len(self.expirations) > 2 * len(self.deadlines) + 64:
+                self.expirations = [(d, k) for k, d in self.deadlines.items()]
+                heapq.heapify(self.expirations)
+        if policy["max_entries"] is not None:
+            keys = policy["keys"]
+            keys[key] = None
+            keys.move_to_end(key)
+            while len(keys) > policy["max_entries"]:
+                self.evict(next(iter(keys)))
+
+    def forget(self, key: Any):
+        self.deadlines.pop(key, None)
+        policy = self.matches.pop(key, None)
+        if policy is not None:
+            policy["keys"].pop(key, None)
+
+    def evict(self, key: Any):
+        value = self.data.pop(key)
+        self.forget(key)
+        invalidate_aliases(keys=[key])
+        for pattern, function in self.hooks:
+            if isinstance(key, str) and fnmatchcase(key, pattern):
+                result = function(key, value)
+                if inspect.isawaitable(result):
+                    task = asyncio.ensure_future(result)
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+
+    def expire(self):
+        """
+        Evicts the expired keys.
+        """
+        now = self.clock()
+        expirations = self.expirations
+        while expirations and expirations[0][0] <= now:
+            deadline, key = heapq.heappop(expirations)
+            if self.deadlines.get(key) == deadline:
+                self.evict(key)
+
+    def __getitem__(self, key: Any) -> Any:
+        value = self.data[key]
+        if key in self.deadlines and self.deadlines[key] <= self.clock():
+            self.evict(key)
+            raise KeyError(key)
+        policy = self.matches.get(key)
+        if policy is not None and policy["max_entries"] is not None:
+            policy["keys"].move_to_end(key)
+        return value
+
+    def __setitem__(self, key: Any, value: Any):
+        self.data[key] = value
+        self.track(key)
+        self.expire()
+
+    def __delitem__(self, key: Any):
+        del self.data[key]
+        self.forget(key)
+
+    def __contains__(self, key: Any) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator:
+        self.expire()
+        return iter(list(self.data))
+
+    def __len__(self) -> int:
+        self.expire()
+        return len(self.data)
+
+
+class SlottedMemory(MutableMapping):
+    """
+    Base of the memories created by `schema`: declared keys are stored in
+    slots, the other ones in the `extra` dict.
+    """
+
+    __slots__ = ("extra",)
+    # declared key -> expected type, None when any value is accepted
+    FIELDS = {}
+    DEFAULTS = {}
+
+    def __init__(self, data: Any = None):
+        self.extra = {}
+        for key, default in self.DEFAULTS.items():
+            setattr(self, key, copy.copy(default))
+        if data:
+            self.update(data)
+
+    def __getitem__(self, key: Any) -> Any:
+        if key in self.FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return self.extra[key]
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key in self.FIELDS:
+            return getattr(self, key, default)
+        return self.extra.get(key, default)
+
+    def __setitem__(self, key: Any, value: Any):
+        if self.validate(key, value):
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def update(self, other: Any = (), /, **kwargs: Any):
+        """
+        Validates every value before writing any, so that a rejected mutation
+        leaves the memory unchanged.
+        """
+        items = dict(other, **kwargs)
+        declared = [self.validate(key, value) for key, value in items.items()]
+        for (key, value), slotted in zip(items.items(), declared):
+            if slotted:
+                setattr(self, key, value)
+            else:
+                self.extra[key] = value
+
+    def validate(self, key: Any, value: Any) -> bool:
+        """
+        Returns whether `key` is declared, raising a `TypeError` if `value`
+        doesn't have its type.
+        """
+        expected = self.FIELDS.get(key, MISSING)
+        if expected is MISSING:
+            return False
+        if expected is not None and not isinstance(value, expected):
+            raise TypeError(
+                f"{key} expects {expected}, received {type(value).__name__}"
+            )
+        return True
+
+    def __delitem__(self, key: Any):
+        if key in self.FIELDS:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        else:
+            del self.extra[key]
+
+    def __contains__(self, key: Any) -> bool:
+        if key in self.FIELDS:
+            return hasattr(self, key)
+        return key in self.extra
+
+    def __iter__(self) -> Iterator:
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        yield from list(self.extra)
+
+    def __len__(self) -> int:
+        return sum(1 for key in self.FIELDS if hasattr(self, key)) + len(
+            self.extra
+        )
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())})"
+
+
+def schema(name: str = "Memory", /, **fields: Any) -> type:
+    """
+    Creates a memory class whose declared keys are stored in `__slots__`: they
+    take less room than dict entries and can be read as attributes. Writes to
+    declared keys, including the mutations of `perpetuate`, are validated with
+    `isinstance` and raise a `TypeError`, a mutation being applied only if
+    all its values are valid. Undeclared keys are kept in a dict.
+
+    It saves memory, not time: every read and write goes through Python
+    methods, so `memory[key]` is about 4 times slower than with a dict and
+    `autofill` is slower too.
+
+    **Args**:
+    - name (str, optional): Name of the class. Defaults to "Memory".
+    - fields: Key -> expected type (a type, a tuple of types or None for any
+        value), or `(type, default)` when the default isn't itself a type.
+
+    **Returns**:
+    - A `MutableMapping` class, to instantiate with the initial values.
+
+    **Example**:
+    ```
+    Memory = schema(count=(int, 0), users=(list, []), session=None)
+    memory = Memory({"token": "..."})
+    memory.count  # 0
+    run(memory=memory)
+    ```
+    """
+    types, defaults = {}, {}
+    for key, declaration in fields.items():
+        if not key.isidentifier() or hasattr(SlottedMemory, key):
+            raise ValueError(f"{key} can't be declared in a schema")
+        # a tuple of types has no default
+        if (
+            isinstance(declaration, tuple)
+            and len(declaration) == 2
+            and not isinstance(declaration[1], type)
+        ):
+            types[key], defaults[key] = declaration
+        else:
+            types[key] = declaration
+    return type(
+        name,
+        (SlottedMemory,),
+        {"__slots__": tuple(types), "FIELDS": types, "DEFAULTS": defaults},
+    )
+
+
+def dump_checkpoint(memory: Any) -> bytes:
+    """
+    Serializes the picklable entries of `memory`, the other ones are skipped.
+    """
+    chunks = [MAGIC]
+    for key, value in list(memory.items()):
+        try:
+            entry = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as err:
+            logging.debug(f"{key} is not checkpointed : {err}")
+            continue
+        chunks.append(LENGTH.pack(len(entry)))
+        chunks.append(entry)
+    return b"".join(chunks)
+
+
+def write_checkpoint(data: bytes, path: str):
+    """
+    Writes `data` to `path` atomically: a crash leaves the previous checkpoint
+    intact.
+    """
+    fd, temporary = tempfile.mkstemp(
+        prefix=".checkpoint-", dir=os.path.dirname(os.path.abspath(path))
+    )
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def checkpoint(memory: Any, path: str):
+    """
+    Saves the picklable entries of `memory` to the file at `path`.
+    """
+    write_checkpoint(dump_checkpoint(memory), path)
+
+
+def restore(
+    path: str, memory: Union[MutableMapping, None] = None, use_mmap: bool = True
+) -> Any:
+    """
+    Loads the checkpoint at `path` into `memory`, a new dict when None. A
+    missing checkpoint restores nothing.
+
+    **Args**:
+    - path (str): Path of the checkpoint.
+    - memory (MutableMapping|None, optional): Defaults to None.
+    - use_mmap (bool, optional): Maps the file instead of reading it, so that
+        entries are unpickled from the page cache without a copy of the file.
+        Defaults to True.
+
+    **Returns**:
+    - memory
+    """
+    if memory is None:
+        memory = {}
+    if not os.path.exists(path):
+        return memory
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if use_mmap and size:
+            data = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ)
+        else:
+            data = file.read()
+    with memoryview(data) as view:
+        if view[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a checkpoint")
+        offset = len(MAGIC)
+        while offset < len(view):
+            (length,) = LENGTH.unpack_from(view, offset)
+            offset += LENGTH.size
+            key, value = pickle.loads(view[offset : offset + length])
+            memory[key] = value
+            offset += length
+    if isinstance(data, mmap.mmap):
+        data.close()
+    return memory
+
+
+async def checkpoint_periodically(memory: Any, path: str, interval: float):
+    """
+    Checkpoints `memory` every `interval` seconds. Entries are pickled in the
+    loop, which owns the memory, and the file is written in a thread.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        data = dump_checkpoint(memory)
+        try:
+            await loop.run_in_executor(None, write_checkpoint, data, path)
+        except Exception as err:
+            logging.error(f"checkpoint to {path} : {err}")
+
+
+__all__ = ["BoundedMemory", "SQLiteMemory", "checkpoint", "restore", "schema"]
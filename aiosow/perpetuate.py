@@ -1,14 +1,299 @@
-import logging, json
+import logging, json, time
 import asyncio
-from typing import Callable, Any, Union
-from collections.abc import Iterable
+from typing import Callable, Any, NamedTuple, Tuple, Union
+from collections.abc import Iterable, AsyncIterable, AsyncIterator, Sized
+from collections import ChainMap, deque
+from contextlib import asynccontextmanager
+from contextvars import Context, ContextVar
+from itertools import islice
 
-from aiosow.autofill import autofill
+from aiosow.autofill import (
+    autofill,
+    autofill_fast,
+    alias_cycle,
+    invalidate_aliases,
+)
 
+# variable name -> tuple of the handlers registered with `on`
 ONS = {}
+CONCURRENT_DISPATCH = False
+MAX_CONCURRENCY = None
+# variable name -> comparison registered with `detect_changes`
+CHANGE_DETECTION = {}
+# (id(memory), variable name) -> last digest of keys compared with a function
+DIGESTS = {}
+# variable name -> number of handler calls skipped by `detect_changes`
+SUPPRESSED = {}
+MISSING = object()
+# "recursive" or "queue", see `scheduler`
+SCHEDULING = "recursive"
+WORKERS = 1
+QUEUE_SIZE = 1024
+QUEUE = None
+WORKER_TASKS = []
+# mutations produced by a worker while the queue is full
+OVERFLOW: ContextVar = ContextVar("aiosow_overflow", default=None)
+# last perpetuated mutations, see `journal`
+JOURNAL = deque(maxlen=1024)
+JOURNAL_SUBSCRIBERS = []
+# id -> state of a handler holding values for a later call, see `state_of`
+DEFERRED = {}
+# tasks running deferred handlers
+DEFERRED_TASKS = set()
 
 
-def on(variable_name: str, condition: Union[Callable, None] = None, singularize=False):
+class Mutation(NamedTuple):
+    """
+    Entry of the mutation journal.
+
+    - timestamp: `time.time()` of the mutation
+    - source: name of the perpetuated function
+    - keys: mutated keys
+    - sizes: `len` of each mutated value, None when it has none
+    """
+
+    timestamp: float
+    source: str
+    keys: Tuple
+    sizes: Tuple
+
+
+def concurrent_dispatch(
+    enabled: bool = True, max_concurrency: Union[int, None] = None
+):
+    """
+    Makes the handlers of a mutation run concurrently, except the ones
+    registered with `on(..., concurrent=False)`. By default, handlers run one
+    after the other in registration order.
+
+    **Args**:
+    - enabled (bool, optional): Defaults to True.
+    - max_concurrency (int|None, optional): Maximum number of concurrent
+        handlers per mutation. Defaults to None (unbounded).
+    """
+    global CONCURRENT_DISPATCH, MAX_CONCURRENCY
+    CONCURRENT_DISPATCH = enabled
+    MAX_CONCURRENCY = max_concurrency
+
+
+def scheduler(mode: str = "queue", workers: int = 1, queue_size: int = 1024):
+    """
+    Selects how the handlers of a mutation are dispatched.
+
+    - `"recursive"` (default): `perpetuate` awaits the handlers of its
+        mutation, which await the handlers of their own mutations and so on:
+        the whole cascade is done when `perpetuate` returns.
+    - `"queue"`: `perpetuate` puts its mutation in a queue of `queue_size`
+        mutations and returns. `workers` tasks dispatch the queued mutations
+        and queue the mutations of their handlers, so cascades don't nest.
+        When the queue is full producers wait, while workers keep the
+        mutations they produce aside to avoid dead locks. Use `drain` to wait
+        for the queue to be empty, but not from a handler: the queue can't be
+        empty while the handler calling it runs, so it would wait forever.
+        Handler errors are logged.
+
+    Switching mode stops the running workers.
+
+    **Args**:
+    - mode (str, optional): `"queue"` or `"recursive"`. Defaults to `"queue"`.
+    - workers (int, optional): Number of workers. Defaults to 1.
+    - queue_size (int, optional): Bound of the queue. Defaults to 1024.
+
+    **Raises**:
+    - ValueError: if the mode is unknown, or `workers` or `queue_size` is
+        lower than 1.
+    """
+    global SCHEDULING, WORKERS, QUEUE_SIZE
+    if mode not in ("queue", "recursive"):
+        raise ValueError(f"unknown scheduling : {mode}")
+    if workers < 1 or queue_size < 1:
+        raise ValueError("workers and queue_size must be at least 1")
+    stop_scheduler()
+    SCHEDULING, WORKERS, QUEUE_SIZE = mode, workers, queue_size
+
+
+def stop_scheduler():
+    """
+    Cancels the workers of the `"queue"` scheduler, dropping queued mutations.
+    """
+    global QUEUE
+    for task in WORKER_TASKS:
+        task.cancel()
+    WORKER_TASKS.clear()
+    QUEUE = None
+
+
+async def drain():
+    """
+    Waits until every queued mutation, and the mutations they cascade into,
+    have been dispatched. Calling it from a handler dispatched by the
+    `"queue"` scheduler dead locks.
+    """
+    if QUEUE is not None and WORKER_TASKS:
+        await QUEUE.join()
+
+
+async def enqueue(update: dict, memory: Any):
+    global QUEUE
+    loop = asyncio.get_running_loop()
+    if QUEUE is None or WORKER_TASKS[0].get_loop() is not loop:
+        stop_scheduler()
+        QUEUE = asyncio.Queue(QUEUE_SIZE)
+        WORKER_TASKS.extend(loop.create_task(work(QUEUE)) for _ in range(WORKERS))
+    overflow = OVERFLOW.get()
+    if overflow is None:
+        await QUEUE.put((update, memory))
+    else:
+        try:
+            QUEUE.put_nowait((update, memory))
+        except asyncio.QueueFull:
+            overflow.append((update, memory))
+
+
+async def work(queue: asyncio.Queue):
+    overflow = deque()
+    OVERFLOW.set(overflow)
+    while True:
+        overflow.append(await queue.get())
+        while overflow:
+            update, memory = overflow.popleft()
+            try:
+                with alias_cycle():
+                    await run_handlers(update, memory)
+            except Exception as err:
+                logging.error(f"dispatch of {list(update)} : {err}")
+        queue.task_done()
+
+
+def journal(size: int = 1024):
+    """
+    Sets how many mutations the journal keeps, 0 disables it. Every perpetuated
+    mutation is recorded as a `Mutation`, which only holds its keys and the
+    sizes of its values: nothing is serialized unless `dump_journal` is called.
+    """
+    global JOURNAL
+    JOURNAL = deque(JOURNAL, maxlen=size)
+
+
+def get_journal() -> list:
+    return list(JOURNAL)
+
+
+def subscribe_journal(subscriber: Callable) -> Callable:
+    """
+    Registers `subscriber` to be called with every `Mutation`, synchronously
+    and whatever the size of the journal.
+    """
+    JOURNAL_SUBSCRIBERS.append(subscriber)
+    return subscriber
+
+
+def dump_journal() -> str:
+    """
+    Serializes the journal to JSON.
+    """
+    return json.dumps([mutation._asdict() for mutation in JOURNAL])
+
+
+def record(function: Callable, update: dict):
+    if not JOURNAL.maxlen and not JOURNAL_SUBSCRIBERS:
+        return
+    mutation = Mutation(
+        time.time(),
+        getattr(function, "__name__", None) or str(function),
+        tuple(update),
+        tuple(size_of(value) for value in update.values()),
+    )
+    JOURNAL.append(mutation)
+    # a failing subscriber must not abort the mutation being recorded
+    for subscriber in JOURNAL_SUBSCRIBERS:
+        try:
+            subscriber(mutation)
+        except Exception as err:
+            logging.error(f"journal subscriber {subscriber} : {err}")
+
+
+def size_of(value: Any) -> Union[int, None]:
+    if not isinstance(value, Sized):
+        return None
+    try:
+        return len(value)
+    except Exception:
+        return None
+
+
+def detect_changes(variable_name: str, compare: Union[str, Callable] = "equality"):
+    """
+    Only fire the `on` handlers of `variable_name` when its perpetuated value
+    differs from the one in memory. The number of handler calls skipped is
+    available with `get_suppressed`.
+
+    **Args**:
+    - variable_name (str): Name of the variable to watch.
+    - compare (str|Callable, optional): How values are compared:
+        - `"identity"`: the value is a different object
+        - `"equality"`: the value is not equal (`!=`) to the previous one
+        - a function: its result for the value (a hash, a version, ...)
+            differs from its result for the previous perpetuated value. Use it
+            for values mutated in place.
+        Defaults to `"equality"`.
+    """
+    if not (compare in ("identity", "equality") or callable(compare)):
+        raise ValueError(f"unknown comparison : {compare}")
+    CHANGE_DETECTION[variable_name] = compare
+
+
+def get_suppressed() -> dict:
+    return SUPPRESSED
+
+
+def clear_suppressed():
+    SUPPRESSED.clear()
+
+
+def changes(update: dict, memory: Any) -> dict:
+    """
+    Returns the part of `update` that changes `memory`, according to
+    `detect_changes`. Must be called before `memory` is updated.
+    """
+    if not CHANGE_DETECTION:
+        return update
+    changed = {}
+    for key, value in update.items():
+        compare = CHANGE_DETECTION.get(key)
+        if compare is None:
+            changed[key] = value
+            continue
+        if compare == "identity":
+            is_changed = memory.get(key, MISSING) is not value
+        elif compare == "equality":
+            previous = memory.get(key, MISSING)
+            is_changed = previous is MISSING or previous != value
+        else:
+            digest = compare(value)
+            is_changed = DIGESTS.get((id(memory), key), MISSING) != digest
+            DIGESTS[(id(memory), key)] = digest
+        if is_changed:
+            changed[key] = value
+        else:
+            SUPPRESSED[key] = SUPPRESSED.get(key, 0) + len(ONS.get(key, ()))
+    return changed
+
+
+def on(
+    variable_name: str,
+    condition: Union[Callable, None] = None,
+    singularize=False,
+    concurrent: Union[bool, None] = None,
+    max_concurrency: Union[int, None] = None,
+    chunk_size: Union[int, None] = None,
+    debounce: Union[float, None] = None,
+    max_latency: Union[float, None] = None,
+    coalesce: bool = False,
+    accumulate: bool = False,
+    batch_size: Union[int, Callable, None] = None,
+    max_wait: Union[float, None] = None,
+):
     """
     Decorator function that registers a function to be executed when a variable
     of specified name is perpetuated in memory.
@@ -20,8 +305,41 @@ def on(variable_name: str, condition: Union[Callable, None] = None, singularize=
         registered function should be executed or not. Defaults to None.
     - singularize (bool, optional): Boolean indicating whether the value of the
         event should be singularized before being passed as an argument to the
-        registered function. If True, the value must be iterable. Defaults to
+        registered function. If True, the value must be iterable or an async
+        iterator. Defaults to False.
+    - concurrent (bool|None, optional): Whether the function runs concurrently
+        with the other handlers of the mutation, bounded by the
+        `max_concurrency` of `concurrent_dispatch`. Defaults to None, which
+        follows `concurrent_dispatch`.
+    - max_concurrency (int|None, optional): With `singularize`, the elements
+        are streamed to `max_concurrency` workers instead of being all
+        gathered at once, so that only a bounded number of them is in memory.
+        Defaults to None.
+    - chunk_size (int|None, optional): With `max_concurrency`, number of
+        elements a worker takes from the iterable at once. Defaults to 1.
+    - debounce (float|None, optional): Waits for `debounce` seconds without
+        a new value before calling the function once, in a task of its own.
+        Defaults to None.
+    - max_latency (float|None, optional): With `debounce`, maximum number of
+        seconds a value waits, even if new values keep coming. Defaults to
+        None (unbounded).
+    - coalesce (bool, optional): Values received while the function runs
+        are collapsed into a single call made right after it. Defaults to
         False.
+    - accumulate (bool, optional): With `debounce` or `coalesce`, the
+        function receives the list of the collapsed values instead of the
+        latest one. Defaults to False.
+    - batch_size (int|Callable|None, optional): The function is called with
+        the list of the values once `batch_size` of them are held. As with
+        `accumulator`, a `Callable` is called with `memory` to get the size.
+        Defaults to None.
+    - max_wait (float|None, optional): With `batch_size`, maximum number of
+        seconds a value waits for its batch to be full: an incomplete batch is
+        then passed to the function, in a task of its own. Defaults to None.
+
+    With `debounce`, `coalesce` and `batch_size`, the values are held per
+    memory: a value is only collapsed with values perpetuated in the same
+    memory, and the function is called with that memory.
 
     **Returns**:
     - The decorated function.
@@ -37,10 +355,35 @@ def on(variable_name: str, condition: Union[Callable, None] = None, singularize=
     are autofilled based on it.
     """
 
+    if chunk_size and not max_concurrency:
+        raise ValueError("chunk_size requires max_concurrency")
+    if max_latency is not None and debounce is None:
+        raise ValueError("max_latency requires debounce")
+    if accumulate and debounce is None and not coalesce:
+        raise ValueError("accumulate requires debounce or coalesce")
+    if max_wait is not None and not batch_size:
+        raise ValueError("max_wait requires batch_size")
+    if batch_size and debounce is not None:
+        raise ValueError("batch_size and debounce can't be combined")
+
     def decorator(function: Callable):
-        if variable_name not in ONS:
-            ONS[variable_name] = []
-        ONS[variable_name].append((condition, function, singularize))
+        handler = {
+            "function": function,
+            "condition": condition,
+            "singularize": singularize,
+            "concurrent": concurrent,
+            "max_concurrency": max_concurrency,
+            "chunk_size": chunk_size or 1,
+            "debounce": debounce,
+            "max_latency": max_latency,
+            "coalesce": coalesce,
+            "accumulate": accumulate or bool(batch_size),
+            "batch_size": batch_size,
+            "max_wait": max_wait,
+            # id(memory) -> values held for a later call, see `state_of`
+            "states": {},
+        }
+        ONS[variable_name] = ONS.get(variable_name, ()) + (handler,)
         return function
 
     return decorator
@@ -71,37 +414,374 @@ async def perpetuate(function: Callable, args: Any = [], memory: Any = {}) -> An
     # updated_values will be {'name': 'John', 'email': None}
     # (assuming the original value of email was None)
     ```
+
+    **note**: aliases registered with `cache="cycle"` are called at most once
+    during a `perpetuate` call, including the handlers it triggers.
+
+    **note**: with `scheduler("queue")`, the handlers are dispatched after
+    `perpetuate` returns.
+    """
+    with alias_cycle():
+        return await _perpetuate(function, args=args, memory=memory)
+
+
+class Transaction:
+    """
+    Stages the mutations of the functions perpetuated with it, see
+    `transaction`.
+
+    - memory: the memory as seen by the transaction, staged values first
+    - update: the merged staged mutations
+    """
+
+    def __init__(self, memory: Any):
+        self.update = {}
+        self.memory = ChainMap(self.update, memory)
+
+    async def perpetuate(self, function: Callable, args: Any = []) -> Any:
+        """
+        Autofills `function` with the memory of the transaction and stages its
+        mutation, without firing any handler.
+        """
+        update = await autofill_fast(function, args=args, memory=self.memory)
+        if isinstance(update, dict):
+            self.update.update(update)
+        return update
+
+
+@asynccontextmanager
+async def transaction(memory: Any):
+    """
+    Groups mutations: they are staged during the block, then applied to
+    `memory` with a single update when it exits and the handlers of every
+    mutated key run once, with its final value. Nothing is applied if the
+    block raises.
+
+    **Example**:
+    ```
+    async with transaction(memory) as batch:
+        await batch.perpetuate(load_users)
+        await batch.perpetuate(load_pages)
+    ```
+    """
+    with alias_cycle():
+        staged = Transaction(memory)
+        yield staged
+        if staged.update:
+            await commit("transaction", staged.update, memory)
+
+
+async def perpetuate_many(*functions: Any, memory: Any = {}) -> dict:
+    """
+    Perpetuates `functions` in a `transaction`: every function sees the
+    mutations of the previous ones but handlers only run once all of them are
+    applied.
+
+    **Args**:
+    - functions: Functions, or `(function, args)` tuples.
+    - memory: The memory
+
+    **Returns**:
+    - The merged mutations.
     """
-    update = await autofill(function, args=args, memory=memory)
+    async with transaction(memory) as staged:
+        for function in functions:
+            args = []
+            if isinstance(function, tuple):
+                function, args = function
+            await staged.perpetuate(function, args=args)
+    return staged.update
+
+
+async def _perpetuate(function: Callable, args: Any, memory: Any) -> Any:
+    update = await autofill_fast(function, args=args, memory=memory)
     if isinstance(update, dict):
-        memory.update(update)
+        await commit(function, update, memory)
+    return update
+
+
+async def commit(function: Any, update: dict, memory: Any):
+    """
+    Applies `update` to `memory` and dispatches the keys it changes.
+    """
+    changed = changes(update, memory)
+    memory.update(update)
+    invalidate_aliases(keys=changed)
+    record(function, update)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
         logging.debug(
             "Mutation = %s", json.dumps(update, indent=4, default=lambda a: str(a))
         )
-        # logging.debug('Memory = %s', json.dumps(memory, indent=4, default=lambda a: str(a)))
+    # logging.debug('Memory = %s', json.dumps(memory, indent=4, default=lambda a: str(a)))
+    await dispatch(changed, memory)
+
+
+async def dispatch(update: dict, memory: Any):
+    """
+    Runs the handlers of `update` or queues it, according to `scheduler`.
+    """
+    if SCHEDULING == "recursive":
+        await run_handlers(update, memory)
+    elif any(key in ONS for key in update):
+        await enqueue(update, memory)
+
+
+async def run_handlers(update: dict, memory: Any):
+    """
+    Calls the handlers registered with `on` for the keys of `update`.
+    Sequential handlers are awaited in registration order while concurrent
+    ones run alongside, and all of them are done when it returns.
+    """
+    tasks = []
+    semaphore = None
+    try:
         for key, value in update.items():
-            if key in ONS:
-                for condition, func, singularize in ONS[key]:
-                    if singularize:
-                        if not isinstance(value, Iterable):
-                            raise ValueError(
-                                "Singularize received a non iterable value"
-                            )
-                        await asyncio.gather(
-                            *[
-                                autofill(func, args=[iterated], memory=memory)
-                                for iterated in value.items()
-                            ]
-                            if isinstance(value, dict)
-                            else [
-                                autofill(func, args=[iterated], memory=memory)
-                                for iterated in value
-                            ]
+            handlers = ONS.get(key)
+            if not handlers:
+                continue
+            for handler in handlers:
+                concurrent = handler["concurrent"]
+                if concurrent or (concurrent is None and CONCURRENT_DISPATCH):
+                    if semaphore is None and MAX_CONCURRENCY:
+                        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+                    tasks.append(
+                        asyncio.ensure_future(
+                            handle_bounded(semaphore, handler, value, memory)
                         )
-                    else:
-                        if (
-                            condition
-                            and await autofill(condition, args=[value], memory=memory)
-                        ) or not condition:
-                            await perpetuate(func, args=[value], memory=memory)
-    return update
+                    )
+                else:
+                    await handle(handler, value, memory)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    if tasks:
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, BaseException):
+                raise result
+
+
+async def handle_bounded(
+    semaphore: Union[asyncio.Semaphore, None], handler: dict, value: Any, memory: Any
+):
+    if semaphore is None:
+        return await handle(handler, value, memory)
+    async with semaphore:
+        return await handle(handler, value, memory)
+
+
+async def handle(handler: dict, value: Any, memory: Any):
+    function = handler["function"]
+    if handler["singularize"]:
+        await singularize(handler, value, memory)
+        return
+    condition = handler["condition"]
+    passed = True
+    if condition:
+        passed = await autofill_fast(condition, args=[value], memory=memory)
+    if passed:
+        if handler["debounce"] is not None:
+            defer(state_of(handler, memory), value)
+        elif handler["batch_size"]:
+            await batch(state_of(handler, memory), value)
+        elif handler["coalesce"]:
+            state = state_of(handler, memory)
+            hold(state, value)
+            await release(state)
+        else:
+            await _perpetuate(function, args=[value], memory=memory)
+
+
+def state_of(handler: dict, memory: Any) -> dict:
+    """
+    Returns the state holding the values of `handler` for `memory`, created
+    on the first value and dropped by `release` once it holds nothing.
+    """
+    states = handler["states"]
+    state = states.get(id(memory))
+    if state is None:
+        state = states[id(memory)] = {
+            "handler": handler,
+            "memory": memory,
+            "pending": [],
+            "timer": None,
+            "deadline": None,
+            "running": False,
+        }
+    return state
+
+
+def hold(state: dict, value: Any):
+    if state["handler"]["accumulate"]:
+        state["pending"].append(value)
+    else:
+        state["pending"] = [value]
+
+
+def defer(state: dict, value: Any):
+    """
+    Holds `value` and (re)arms the timer of a debounced handler, without
+    going past its `max_latency`.
+    """
+    hold(state, value)
+    handler = state["handler"]
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+    delay = handler["debounce"]
+    if handler["max_latency"] is not None:
+        if state["deadline"] is None:
+            state["deadline"] = now + handler["max_latency"]
+        delay = min(delay, state["deadline"] - now)
+    arm(state, delay)
+
+
+async def batch(state: dict, value: Any):
+    """
+    Holds `value` and calls the function of the handler once its batch is
+    full, arming the `max_wait` timer on the first value of a batch.
+    """
+    hold(state, value)
+    handler = state["handler"]
+    size = handler["batch_size"]
+    if callable(size):
+        size = size(state["memory"])
+    if len(state["pending"]) >= size:
+        disarm(state)
+        await release(state)
+        return
+    if state["timer"] is None and handler["max_wait"] is not None:
+        arm(state, handler["max_wait"])
+    DEFERRED[id(state)] = state
+
+
+def arm(state: dict, delay: float):
+    if state["timer"] is not None:
+        state["timer"].cancel()
+    # a fresh context: the call must not join the current cycle or worker
+    state["timer"] = asyncio.get_running_loop().call_later(
+        delay, fire, state, context=Context()
+    )
+    DEFERRED[id(state)] = state
+
+
+def disarm(state: dict):
+    if state["timer"] is not None:
+        state["timer"].cancel()
+    state["timer"] = state["deadline"] = None
+    DEFERRED.pop(id(state), None)
+
+
+def fire(state: dict) -> asyncio.Future:
+    disarm(state)
+    task = asyncio.ensure_future(release_logged(state))
+    DEFERRED_TASKS.add(task)
+    task.add_done_callback(DEFERRED_TASKS.discard)
+    return task
+
+
+async def release_logged(state: dict):
+    try:
+        with alias_cycle():
+            await release(state)
+    except Exception as err:
+        logging.error(f"deferred call of {state['handler']['function']} : {err}")
+
+
+async def release(state: dict):
+    """
+    Calls the function of the handler with the values held in `state`. With
+    `coalesce`, only one call runs at a time and it takes the values held
+    meanwhile.
+    """
+    handler = state["handler"]
+    coalesce = handler["coalesce"]
+    if coalesce:
+        if state["running"]:
+            return  # the running call takes the value
+        state["running"] = True
+    try:
+        while state["pending"]:
+            pending, state["pending"] = state["pending"], []
+            await _perpetuate(
+                handler["function"],
+                args=[pending if handler["accumulate"] else pending[-1]],
+                memory=state["memory"],
+            )
+            if not coalesce:
+                break
+    finally:
+        if coalesce:
+            state["running"] = False
+        if not (state["pending"] or state["timer"] or state["running"]):
+            states = handler["states"]
+            if states.get(id(state["memory"])) is state:
+                del states[id(state["memory"])]
+
+
+async def flush_handlers():
+    """
+    Calls the debounced and batched handlers holding values right away and
+    waits for every deferred call to be done.
+    """
+    for state in list(DEFERRED.values()):
+        fire(state)
+    while DEFERRED_TASKS:
+        await asyncio.gather(*DEFERRED_TASKS)
+
+
+async def singularize(handler: dict, value: Any, memory: Any):
+    """
+    Autofills the handler's function with every element of `value`: all at once
+    or, with `max_concurrency`, streamed to a bounded pool of workers.
+    """
+    function = handler["function"]
+    if isinstance(value, dict):
+        value = value.items()
+    if isinstance(value, AsyncIterable):
+        elements = value.__aiter__()
+    elif isinstance(value, Iterable):
+        elements = iter(value)
+    else:
+        raise ValueError("Singularize received a non iterable value")
+    max_concurrency = handler["max_concurrency"]
+    if not max_concurrency:
+        if isinstance(elements, AsyncIterator):
+            elements = [element async for element in elements]
+        await asyncio.gather(
+            *[autofill(function, args=[element], memory=memory) for element in elements]
+        )
+        return
+
+    chunk_size = handler["chunk_size"]
+    lock = asyncio.Lock()
+
+    async def take() -> list:
+        if not isinstance(elements, AsyncIterator):
+            return list(islice(elements, chunk_size))
+        chunk = []
+        async with lock:  # an async generator can't be advanced concurrently
+            async for element in elements:
+                chunk.append(element)
+                if len(chunk) == chunk_size:
+                    break
+        return chunk
+
+    async def worker():
+        chunk = await take()
+        while chunk:
+            for element in chunk:
+                await autofill(function, args=[element], memory=memory)
+            chunk = await take()
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max_concurrency)]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        # a worker suspended in the generator must be done before it's closed
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+    finally:
+        if hasattr(elements, "aclose"):
+            await elements.aclose()
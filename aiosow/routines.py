@@ -4,6 +4,7 @@ from functools import wraps
 import asyncio, logging
 
 from aiosow.perpetuate import perpetuate, autofill
+from aiosow.autofill import autofill_fast
 from aiosow.bindings import return_true
 from aiosow.setup import trigger_routines
 
@@ -96,7 +97,8 @@ async def consume_routines(memory):
             function = routine["function"]
             # Check the condition before running the routine
             try:
-                if await autofill(condition, args=[], memory=memory):
+                passed = await autofill_fast(condition, args=[], memory=memory)
+                if passed:
                     if routine["perpetuate"]:
                         await perpetuate(function, args=[], memory=memory)
                     else:
@@ -0,0 +1,113 @@
+"""
+Transport of large buffers between processes, used by
+`make_async(executor=..., shared=...)`.
+
+Buffers are written once to a memory-mapped file (in `/dev/shm` when it exists)
+and only the small `SharedBuffer` descriptor is pickled. The other side maps the
+same file and receives a buffer of the type that was shared: a `memoryview`,
+with its format and shape, on the mapping without any copy, or `bytes`,
+`bytearray` and `array`s copied once out of it.
+"""
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+from array import array
+
+import mmap, os, tempfile
+
+DIRECTORY = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+# default size from which a buffer is shared instead of pickled
+THRESHOLD = 1 << 16
+
+
+class SharedBuffer(NamedTuple):
+    """
+    A buffer written to a memory-mapped file.
+    """
+
+    path: str
+    size: int
+    # name of the shared type, and the format (the typecode of an `array`) and
+    # shape of its items
+    kind: str = "memoryview"
+    format: str = "B"
+    shape: Tuple[int, ...] = ()
+
+
+def share(value: Any, threshold: int = THRESHOLD) -> Any:
+    """
+    Writes `value` to a memory-mapped file and returns its `SharedBuffer` if it
+    is a contiguous buffer of at least `threshold` bytes, returns it unchanged
+    otherwise.
+    """
+    if not isinstance(value, (bytes, bytearray, memoryview, array)):
+        return value
+    view = memoryview(value)
+    if view.nbytes < max(threshold, 1) or not view.c_contiguous:
+        return value
+    try:  # the view must be rebuilt from the bytes of the mapping
+        view.cast("B").cast(view.format, view.shape)
+    except (TypeError, ValueError):
+        return value
+    kind = type(value).__name__
+    fmt = value.typecode if isinstance(value, array) else view.format
+    fd, path = tempfile.mkstemp(prefix="aiosow-", dir=DIRECTORY)
+    try:
+        os.ftruncate(fd, view.nbytes)
+        with mmap.mmap(fd, view.nbytes) as mapped:
+            mapped[:] = view.cast("B")
+    finally:
+        os.close(fd)
+    return SharedBuffer(path, view.nbytes, kind, fmt, view.shape)
+
+
+def attach(value: Any, unlink: bool = False) -> Any:
+    """
+    Maps a `SharedBuffer` and returns the buffer it was shared from, other
+    values are returned unchanged. A `memoryview` is mapped in place and the
+    mapping lives as long as the view, the other types are copied.
+
+    With `unlink`, the file is removed right away: the mapping stays valid.
+    """
+    if not isinstance(value, SharedBuffer):
+        return value
+    with open(value.path, "r+b") as file:
+        mapped = mmap.mmap(file.fileno(), value.size)
+    if unlink:
+        release(value)
+    if value.kind == "memoryview":
+        return memoryview(mapped).cast(value.format, value.shape)
+    with mapped:
+        if value.kind == "array":
+            copied = array(value.format)
+            copied.frombytes(mapped)
+            return copied
+        return (bytes if value.kind == "bytes" else bytearray)(mapped)
+
+
+def release(value: Any):
+    """
+    Removes the file of a `SharedBuffer`.
+    """
+    if isinstance(value, SharedBuffer):
+        try:
+            os.unlink(value.path)
+        except FileNotFoundError:  # pragma: no cover
+            pass
+
+
+def call_shared(
+    function: Callable, args: List, kwargs: Dict, threshold: int = THRESHOLD
+) -> Any:
+    """
+    Runs in the worker process: maps the shared arguments, calls `function` and
+    shares its result, or the values of its result when it is a mutation.
+    """
+    result = function(
+        *[attach(arg) for arg in args],
+        **{key: attach(value) for key, value in kwargs.items()},
+    )
+    if isinstance(result, dict):
+        return {key: share(value, threshold) for key, value in result.items()}
+    return share(result, threshold)
+
+
+__all__ = []
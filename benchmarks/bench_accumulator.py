@@ -0,0 +1,40 @@
+"""
+Micro-benchmark of `accumulator` against `array_accumulator` for numeric
+samples converted to an array by the batch function.
+
+Run it with `python benchmarks/bench_accumulator.py`.
+"""
+import asyncio, time
+from array import array
+
+from aiosow.bindings import accumulator, array_accumulator
+
+SAMPLES = 200000
+SIZE = 1000
+
+
+def from_list(values):
+    return sum(array("d", values))
+
+
+def from_view(values):
+    return sum(values)
+
+
+async def measure(batched):
+    start = time.perf_counter()
+    for i in range(SAMPLES):
+        await batched(i * 0.5)
+    return (time.perf_counter() - start) / SAMPLES * 1e9
+
+
+async def main():
+    for label, batched in (
+        ("accumulator", accumulator(SIZE)(from_list)),
+        ("array_accumulator", array_accumulator(SIZE)(from_view)),
+    ):
+        print(f"{label:>18} : {await measure(batched):6.0f} ns/value")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
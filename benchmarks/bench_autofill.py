@@ -0,0 +1,56 @@
+"""
+Micro-benchmark of `aiosow.autofill.autofill` on typical bindings.
+
+Run it with `python benchmarks/bench_autofill.py`.
+"""
+import asyncio, time
+
+from aiosow.autofill import autofill, alias, reset_aliases
+
+ITERATIONS = 20000
+
+
+def handler(value, a, b=2, memory=None):
+    return value
+
+
+def condition(value):
+    return True
+
+
+def variadic(memory, *args):
+    return args
+
+
+async def coroutine(value, a, b=2):
+    return value
+
+
+def aliased(value, config):
+    return value
+
+
+async def measure(function, args, memory):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await autofill(function, args=args, memory=memory)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+async def main():
+    reset_aliases()
+    alias("config")(lambda: {"debug": False})
+    memory = {"a": 1, "b": 3}
+    for function, args in (
+        (handler, [1]),
+        (condition, [1]),
+        (variadic, [1, 2, 3]),
+        (coroutine, [1]),
+        (aliased, [1]),
+    ):
+        elapsed = await measure(function, args, memory)
+        print(f"{function.__name__:>10} : {elapsed:6.2f} µs/call")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark of condition-heavy compositions: a mutation watched by many
+`on()` handlers, each guarded by a synchronous condition.
+
+Run it with `python benchmarks/bench_conditions.py`.
+"""
+import asyncio, time
+
+from aiosow.autofill import autofill, autofill_sync
+from aiosow.bindings import return_true
+from aiosow.perpetuate import perpetuate, on
+
+ITERATIONS = 5000
+HANDLERS = 10
+
+
+def is_even(value):
+    return value % 2 == 0
+
+
+def handler(value, counter):
+    return None
+
+
+def mutation(value):
+    return {"value": value}
+
+
+async def measure(memory):
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        await perpetuate(mutation, args=[i], memory=memory)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+async def measure_condition(memory):
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        await autofill(is_even, args=[i], memory=memory)
+    asynchronous = (time.perf_counter() - start) / ITERATIONS * 1e6
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        autofill_sync(is_even, args=[i], memory=memory)
+    synchronous = (time.perf_counter() - start) / ITERATIONS * 1e6
+    return asynchronous, synchronous
+
+
+async def main():
+    asynchronous, synchronous = await measure_condition({})
+    print(f"condition with autofill      : {asynchronous:6.2f} µs/call")
+    print(f"condition with autofill_sync : {synchronous:6.2f} µs/call")
+    for i in range(HANDLERS):
+        on("value", condition=is_even if i % 2 else return_true)(handler)
+    elapsed = await measure({"counter": 0})
+    print(
+        f"perpetuate with {HANDLERS} conditional handlers : {elapsed:6.2f} µs/call"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark of a `schema` memory against a plain dict memory.
+
+Run it with `python benchmarks/bench_memory.py`.
+"""
+import asyncio, sys, time
+
+from aiosow.autofill import autofill
+from aiosow.memory import schema
+from aiosow.perpetuate import perpetuate
+
+ITERATIONS = 20000
+Memory = schema(count=(int, 0), name=(str, ""), ratio=(float, 0.0), users=list)
+
+
+def handler(value, count, name, ratio=1.0):
+    return value
+
+
+def increment(count):
+    return {"count": count + 1}
+
+
+async def measure(function, args, memory, caster):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await caster(function, args=args, memory=memory)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def size(memory):
+    if isinstance(memory, dict):
+        return sys.getsizeof(memory)
+    return sys.getsizeof(memory) + sys.getsizeof(memory.extra)
+
+
+async def main():
+    values = {"count": 0, "name": "bench", "ratio": 0.5, "users": []}
+    for label, memory in (("dict", dict(values)), ("schema", Memory(values))):
+        autofilled = await measure(handler, [1], memory, autofill)
+        memory["count"] = 0
+        perpetuated = await measure(increment, [], memory, perpetuate)
+        print(
+            f"{label:>7} : autofill {autofilled:6.2f} µs/call, "
+            f"perpetuate {perpetuated:6.2f} µs/call, {size(memory)} bytes"
+        )
+        start = time.perf_counter()
+        for _ in range(ITERATIONS * 10):
+            memory["count"]
+        elapsed = (time.perf_counter() - start) / ITERATIONS / 10 * 1e9
+        print(f"{label:>7} : memory['count'] {elapsed:6.1f} ns")
+    memory = Memory(values)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS * 10):
+        memory.count
+    elapsed = (time.perf_counter() - start) / ITERATIONS / 10 * 1e9
+    print(f"{'schema':>7} : memory.count {elapsed:6.1f} ns")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
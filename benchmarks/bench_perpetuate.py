@@ -0,0 +1,37 @@
+"""
+Micro-benchmark of `perpetuate` on large mutations, with debug logs disabled.
+
+Run it with `python benchmarks/bench_perpetuate.py`.
+"""
+import asyncio, time
+
+from aiosow.perpetuate import perpetuate
+
+ITERATIONS = 2000
+
+
+def mutation(index):
+    return {
+        "entities": {
+            f"entity-{i}": {"index": index, "tags": ["a", "b"]} for i in range(100)
+        },
+        "samples": list(range(1000)),
+    }
+
+
+def identity(update):
+    return update
+
+
+async def main():
+    memory = {}
+    updates = [mutation(i) for i in range(ITERATIONS)]
+    start = time.perf_counter()
+    for update in updates:
+        await perpetuate(identity, args=[update], memory=memory)
+    elapsed = (time.perf_counter() - start) / ITERATIONS * 1e6
+    print(f"perpetuate of a large mutation : {elapsed:8.2f} µs/call")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,11 +1,16 @@
+import asyncio, time
 import pytest
 
 from aiosow.bindings import delay
+from aiosow.perpetuate import perpetuate, on
 from aiosow.autofill import (
     get_aliases,
     reset_aliases,
     autofill,
+    autofill_sync,
+    is_sync,
     alias,
+    get_call_plan,
     get_function_representation,
 )
 
@@ -143,6 +148,294 @@ async def test_autofill_aliased():
     assert await autofill(my_function7, args=args, memory=memory) == "correct"
 
 
+@pytest.mark.asyncio
+async def test_autofill_keyword_only():
+    def my_function8(a, *args, b, c=3, memory):
+        return a, args, b, c, memory
+
+    memory = {"b": 2}
+    assert await autofill(my_function8, args=(1, 4), memory=memory) == (
+        1,
+        (4,),
+        2,
+        3,
+        memory,
+    )
+
+
+@pytest.mark.asyncio
+async def test_autofill_not_weak_referenceable():
+    class Slotted:
+        __slots__ = ()
+
+        def __call__(self, value):
+            return value
+
+    assert await autofill(Slotted(), memory={"value": 1}) == 1
+    assert await autofill(len, args=([1, 2],)) == 2
+
+
+@pytest.mark.asyncio
+async def test_call_plan_invalidated_by_alias():
+    reset_aliases()
+
+    def my_function9(value):
+        return value
+
+    plan = get_call_plan(my_function9)
+    assert get_call_plan(my_function9) is plan
+    assert await autofill(my_function9, memory={"value": 1}) == 1
+    alias("value")(lambda: 2)
+    assert get_call_plan(my_function9) is not plan
+    assert await autofill(my_function9, memory={"value": 1}) == 2
+    reset_aliases()
+
+
+@pytest.mark.asyncio
+async def test_aliases_resolved_concurrently():
+    reset_aliases()
+
+    async def slow_a():
+        await asyncio.sleep(0.1)
+        return "a"
+
+    async def slow_b():
+        await asyncio.sleep(0.1)
+        return "b"
+
+    async def slow_c(*, memory):
+        await asyncio.sleep(0.1)
+        return memory["c"]
+
+    alias("slow_a")(slow_a)
+    alias("slow_b")(slow_b)
+    alias("slow_c")(slow_c)
+
+    def my_function10(slow_a, slow_b, *, slow_c):
+        return slow_a + slow_b + slow_c
+
+    start_time = time.monotonic()
+    assert await autofill(my_function10, memory={"c": "c"}) == "abc"
+    assert time.monotonic() - start_time < 0.2
+    reset_aliases()
+
+
+@pytest.mark.asyncio
+async def test_alias_dependencies_resolved_once():
+    reset_aliases()
+    calls = []
+
+    def config():
+        calls.append("config")
+        return {"url": "db://"}
+
+    def database(config):
+        return config["url"]
+
+    alias("database")(database)
+    alias("config")(config)
+
+    def my_function11(config, database):
+        return config, database
+
+    assert await autofill(my_function11) == ({"url": "db://"}, "db://")
+    assert calls == ["config"]
+    reset_aliases()
+
+
+def test_alias_cycle_detected_at_registration():
+    reset_aliases()
+    alias("first")(lambda second: second)
+    alias("second")(lambda third: third)
+    with pytest.raises(ValueError):
+        alias("third")(lambda first: first)
+    assert "third" not in get_aliases()
+    with pytest.raises(ValueError):
+        alias("self")(lambda self: self)
+    reset_aliases()
+
+
+@pytest.mark.asyncio
+async def test_decorated_alias():
+    reset_aliases()
+
+    async def value():
+        return 1
+
+    alias("value")(delay(0)(value))
+    assert await autofill(lambda value: value + 1) == 2
+    reset_aliases()
+
+
+@pytest.mark.asyncio
+async def test_alias_cached_per_cycle():
+    reset_aliases()
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return len(calls)
+
+    alias("expensive_cycle", cache="cycle")(expensive)
+    on("cycle_event")(lambda expensive_cycle: {"first": expensive_cycle})
+    on("cycle_event")(lambda expensive_cycle: {"second": expensive_cycle})
+    memory = {}
+    await perpetuate(lambda: {"cycle_event": True}, memory=memory)
+    assert memory["first"] == memory["second"] == 1
+    await perpetuate(lambda: {"cycle_event": True}, memory=memory)
+    assert memory["first"] == memory["second"] == 2
+    # outside of perpetuate the alias isn't cached
+    await autofill(lambda expensive_cycle: expensive_cycle)
+    await autofill(lambda expensive_cycle: expensive_cycle)
+    assert len(calls) == 4
+    reset_aliases()
+
+
+@pytest.mark.asyncio
+async def test_alias_cached_with_ttl():
+    reset_aliases()
+    calls = []
+
+    async def expensive():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    alias("expensive_ttl", cache=0.1)(expensive)
+    results = await asyncio.gather(
+        autofill(lambda expensive_ttl: expensive_ttl),
+        autofill(lambda expensive_ttl: expensive_ttl),
+    )
+    assert results == [1, 1]
+    await asyncio.sleep(0.1)
+    assert await autofill(lambda expensive_ttl: expensive_ttl) == 2
+    reset_aliases()
+
+
+@pytest.mark.asyncio
+async def test_alias_invalidated_by_reads():
+    reset_aliases()
+    calls = []
+
+    def config(config_path):
+        calls.append(config_path)
+        return {"path": config_path}
+
+    alias("config", reads=["config_path"])(config)
+    alias("url", cache=60)(lambda config: config["path"] + "/url")
+    memory = {"config_path": "a"}
+    assert await autofill(lambda url: url, memory=memory) == "a/url"
+    assert await autofill(lambda url, config: url, memory=memory) == "a/url"
+    assert calls == ["a"]
+    await perpetuate(lambda: {"unrelated": True}, memory=memory)
+    assert await autofill(lambda url: url, memory=memory) == "a/url"
+    await perpetuate(lambda: {"config_path": "b"}, memory=memory)
+    assert await autofill(lambda url: url, memory=memory) == "b/url"
+    assert calls == ["a", "b"]
+    reset_aliases()
+
+
+@pytest.mark.asyncio
+async def test_cached_alias_failures_are_not_cached():
+    reset_aliases()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise ValueError("flaky")
+        return "ok"
+
+    alias("flaky", cache=60)(flaky)
+    with pytest.raises(ValueError):
+        await autofill(lambda flaky: flaky)
+    assert await autofill(lambda flaky: flaky) == "ok"
+
+    with pytest.raises(ValueError):
+        alias("unknown", cache="forever")
+    reset_aliases()
+
+
+@pytest.mark.asyncio
+async def test_cached_alias_survives_cancelled_resolution():
+    reset_aliases()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "slow"
+
+    alias("slow", cache=60)(slow)
+    starter = asyncio.create_task(autofill(lambda slow: slow))
+    await asyncio.sleep(0.005)
+    waiters = [asyncio.create_task(autofill(lambda slow: slow)) for _ in range(2)]
+    await asyncio.sleep(0.005)
+    starter.cancel()
+    waiters[0].cancel()
+    for task in (starter, waiters[0]):
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    assert await waiters[1] == "slow"
+    assert await autofill(lambda slow: slow) == "slow"
+    assert calls == [1]
+    reset_aliases()
+
+
+def test_autofill_sync():
+    reset_aliases()
+    alias("base")(lambda: 1)
+    alias("incremented")(lambda base: base + 1)
+
+    def my_function12(value, base, incremented, *, memory):
+        return value + base + incremented + memory["offset"]
+
+    assert is_sync(my_function12)
+    assert autofill_sync(my_function12, args=[1], memory={"offset": 10}) == 14
+
+    async def my_function13():
+        return 1
+
+    assert not is_sync(my_function13)
+    with pytest.raises(TypeError):
+        autofill_sync(my_function13)
+
+    alias("awaited")(my_function13)
+    assert not is_sync(lambda awaited: awaited)
+    alias("cached", cache=1)(lambda: 1)
+    assert not is_sync(lambda cached: cached)
+    assert not is_sync(delay(0)(lambda: 1))
+    reset_aliases()
+
+
+@pytest.mark.asyncio
+async def test_sync_alias_returning_coroutine():
+    reset_aliases()
+
+    async def fetch():
+        return 42
+
+    alias("fetched")(lambda: fetch())
+    alias("first")(lambda: 1)
+    alias("doubled")(lambda fetched: fetched * 2)
+
+    def consumer(first, fetched, doubled):
+        return first + fetched + doubled
+
+    assert is_sync(consumer)
+    result = autofill_sync(consumer, memory={})
+    assert asyncio.iscoroutine(result)
+    assert await result == 127
+    assert await autofill(consumer, memory={}) == 127
+
+    calls = []
+    on("sync_aliased")(lambda fetched: calls.append(fetched))
+    await perpetuate(lambda: {"sync_aliased": True}, memory={})
+    assert calls == [42]
+    reset_aliases()
+
+
 def test_get_function_representation():
     # Test case 1: Test with a named function
     def named_function():
@@ -14,15 +14,30 @@ from aiosow.bindings import (
     each,
     wire,
     accumulator,
+    array_accumulator,
+    flush_accumulators,
     read_only,
     debug,
     make_async,
     until_success,
 )
 
+from aiosow.autofill import executor, get_executor, shutdown_executors
+from concurrent.futures import ThreadPoolExecutor
+
 from unittest.mock import Mock
 
 
+def cube(value):
+    """Module level to be sent to a process pool"""
+    return value**3
+
+
+def keywords(**kwargs):
+    """Module level to be sent to a process pool"""
+    return sorted(kwargs)
+
+
 @pytest.fixture
 def synchronous_function():
     def my_synchronous_function():
@@ -199,6 +214,41 @@ async def test_make_async_parameters():
     assert results == [4]
 
 
+@pytest.mark.asyncio
+async def test_make_async_named_executor():
+    executor("single", max_workers=1)
+
+    @make_async(executor="single")
+    def wait():
+        time.sleep(0.1)
+        return "foo"
+
+    start_time = time.monotonic()
+    assert await asyncio.gather(wait(), wait()) == ["foo", "foo"]
+    assert time.monotonic() - start_time >= 0.2
+    running = get_executor("single")
+    executor("single", max_workers=2)
+    assert get_executor("single") is not running
+    shutdown_executors()
+
+
+@pytest.mark.asyncio
+async def test_make_async_executor_instance():
+    with ThreadPoolExecutor(1) as pool:
+        assert await make_async(lambda value: value + 1, executor=pool)(1) == 2
+
+
+@pytest.mark.asyncio
+async def test_make_async_processes():
+    executor("processes", max_workers=1, processes=True)
+    memory = {"value": 2}
+    assert await make_async(executor="processes")(cube)(memory=memory) == 8
+    assert await make_async(executor="processes")(keywords)(memory=memory) == []
+    with pytest.raises(ValueError):
+        await make_async(executor="processes")(lambda memory: memory)(memory=memory)
+    shutdown_executors()
+
+
 @pytest.mark.asyncio
 async def test_chain():
     def add(x):
@@ -335,3 +385,388 @@ async def test_adapter():
     adapter_func = adapter(resolve)(multiply_by_two)
     result = await adapter_func(1)
     assert result == 4
+
+
+@pytest.mark.asyncio
+async def test_wire_worker_pool():
+    running, peak, produced, handled = 0, 0, [], []
+    trigger, listen = wire(max_concurrency=2, queue_size=2)
+
+    @listen
+    async def slow(value):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+        handled.append(value)
+
+    @trigger
+    def generator():
+        for i in range(20):
+            produced.append(i)
+            # the generator can't run ahead of the workers by more than the
+            # queue, the jobs in the workers and the one being put
+            assert len(produced) - len(handled) <= 5
+            yield i
+
+    await generator()
+    assert sorted(handled) == list(range(20))
+    assert peak == 2
+
+    await trigger(lambda: 7)()
+    assert handled[-1] == 7
+
+
+@pytest.mark.asyncio
+async def test_wire_worker_pool_error():
+    produced = []
+    trigger, listen = wire(max_concurrency=2, queue_size=1)
+    listen(None)
+
+    @listen
+    def failing(value):
+        if value == 3:
+            raise ValueError(value)
+
+    @trigger
+    def generator():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    with pytest.raises(ValueError):
+        await generator()
+    assert len(produced) < 10
+
+    @trigger
+    def interrupted():
+        yield 1
+        raise KeyError
+
+    with pytest.raises(KeyError):
+        await interrupted()
+
+
+@pytest.mark.asyncio
+async def test_wire_async_generator():
+    events = []
+    trigger, listen = wire()
+    listen(None)
+    listen(lambda value: events.append(("first", value)))
+
+    @listen
+    async def second(value):
+        await asyncio.sleep(0)
+        events.append(("second", value))
+
+    @trigger
+    async def generator():
+        for i in range(3):
+            events.append(("yield", i))
+            yield i
+
+    await generator()
+    # a value is delivered before the next one is produced
+    assert events[:3] == [("yield", 0), ("first", 0), ("second", 0)]
+    assert len(events) == 9
+
+
+@pytest.mark.asyncio
+async def test_wire_async_generator_cancel():
+    closed, received = [], []
+    for max_concurrency in (None, 2):
+        trigger, listen = wire(max_concurrency=max_concurrency)
+
+        @listen
+        async def stuck(value):
+            received.append(value)
+            await asyncio.sleep(10)
+
+        @trigger
+        async def generator():
+            try:
+                for i in range(100):
+                    yield i
+            finally:
+                closed.append(max_concurrency)
+
+        task = asyncio.ensure_future(generator())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    assert closed == [None, 2]
+    assert len(received) < 10
+
+
+@pytest.mark.asyncio
+async def test_wire_async_generator_worker_pool():
+    handled = []
+    trigger, listen = wire(max_concurrency=3, queue_size=2)
+
+    @listen
+    async def handle(value):
+        await asyncio.sleep(0.001)
+        if value == 30:
+            raise ValueError(value)
+        handled.append(value)
+
+    @trigger
+    async def generator(size):
+        for i in range(size):
+            yield i
+
+    await generator(20)
+    assert sorted(handled) == list(range(20))
+    with pytest.raises(ValueError):
+        await generator(1000)
+    assert len(handled) < 60
+
+
+@pytest.mark.asyncio
+async def test_wire_partition_key():
+    delivered = []
+    depths = []
+    trigger, listen = wire(partition_key=lambda value: value[0])
+
+    @listen
+    async def handle(value):
+        depths.append(trigger.depths())
+        # later values of the partition would overtake this one if
+        # partitions weren't ordered
+        await asyncio.sleep(0.01 if value[1] == 0 else 0)
+        delivered.append(value)
+
+    @trigger
+    def event(entity, version):
+        return (entity, version)
+
+    await asyncio.gather(
+        *[event(entity, version) for version in range(3) for entity in "ab"]
+    )
+    for entity in "ab":
+        assert [v for e, v in delivered if e == entity] == [0, 1, 2]
+    assert depths[0] == {"a": 3, "b": 3}
+    assert trigger.depths() == {}
+
+
+@pytest.mark.asyncio
+async def test_wire_partition_key_error():
+    delivered = []
+
+    async def key(value):
+        if value == 3:
+            raise KeyError(value)
+        return value % 2
+
+    trigger, listen = wire(partition_key=key)
+
+    @listen
+    async def handle(value):
+        await asyncio.sleep(0.001)
+        if value == 1:
+            raise ValueError(value)
+        delivered.append(value)
+
+    @trigger
+    def generator():
+        yield from range(5)
+
+    with pytest.raises(KeyError):
+        await generator()
+    # the values pushed before the error were delivered before it was raised
+    assert delivered == [0, 2]
+    assert trigger.depths() == {}
+
+
+@pytest.mark.asyncio
+async def test_wire_partition_key_backlog():
+    produced, handled = [], []
+    trigger, listen = wire(partition_key=lambda value: value % 2, queue_size=3)
+
+    @listen
+    async def slow(value):
+        await asyncio.sleep(0.001)
+        handled.append(value)
+
+    @trigger
+    async def generator():
+        for i in range(20):
+            produced.append(i)
+            # the values waiting in the partitions and the one being pushed
+            assert len(produced) - len(handled) <= 4
+            yield i
+
+    await generator()
+    assert sorted(handled) == list(range(20))
+    assert trigger.depths() == {}
+
+
+@pytest.mark.asyncio
+async def test_wire_partition_key_errors_and_concurrency():
+    running, peak, delivered = 0, 0, []
+    trigger, listen = wire(partition_key=lambda value: value % 3, max_concurrency=2)
+
+    @listen
+    async def handle(value):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+        if value == 4:
+            raise ValueError(value)
+        delivered.append(value)
+
+    @trigger
+    def generator():
+        yield from range(9)
+
+    @trigger
+    async def async_generator():
+        for i in range(9):
+            yield i
+
+    with pytest.raises(ValueError):
+        await generator()
+    assert sorted(delivered) == [0, 1, 2, 3, 5, 6, 7, 8]
+    assert peak == 2
+    delivered.clear()
+    with pytest.raises(ValueError):
+        await async_generator()
+    assert len(delivered) == 8
+
+    task = asyncio.ensure_future(trigger(lambda: 10)())
+    await asyncio.sleep(0)
+    task.cancel()
+    await asyncio.sleep(0.01)
+    assert delivered[-1] == 10
+
+
+@pytest.mark.asyncio
+async def test_accumulator_max_wait():
+    batches = []
+    batched = accumulator(3, max_wait=0.02)(
+        lambda values, memory: batches.append(values)
+    )
+    await batched(1, memory={})
+    await batched(2, memory={})
+    assert batches == []
+    await asyncio.sleep(0.05)
+    assert batches == [[1, 2]]
+    await batched(3, memory={})
+    await batched(4, 5, memory={})
+    await asyncio.sleep(0.05)
+    assert batches == [[1, 2], [3, 4, 5]]
+
+
+@pytest.mark.asyncio
+async def test_accumulator_max_bytes_and_flush():
+    batches = []
+
+    async def store(values):
+        await asyncio.sleep(0)
+        batches.append(values)
+
+    batched = accumulator(100, max_bytes=10)(store)
+    await batched(b"12345")
+    await batched(b"67890", b"x")
+    assert batches == [[b"12345", b"67890", b"x"]]
+    await batched(b"1")
+    assert await batched.flush() is None
+    assert batches[-1] == [b"1"]
+    assert await batched.flush() is None
+    assert len(batches) == 2
+    await batched("string")
+    await flush_accumulators()
+    assert batches[-1] == ["string"]
+
+
+@pytest.mark.asyncio
+async def test_flush_accumulators(caplog):
+    def failing(values):
+        raise ValueError(values)
+
+    batched = accumulator(10, max_wait=0.01)(failing)
+    await batched(1)
+    await asyncio.sleep(0.03)
+    assert "accumulated call" in caplog.text
+    caplog.clear()
+    await batched(2)
+    await flush_accumulators()
+    assert "accumulated call" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_flush_accumulators_waits_timers():
+    batches = []
+
+    async def slow(values):
+        await asyncio.sleep(0.05)
+        batches.append(values)
+
+    batched = accumulator(10, max_wait=0.01)(slow)
+    await batched(1)
+    await asyncio.sleep(0.02)
+    assert batches == []
+    await flush_accumulators()
+    assert batches == [[1]]
+
+
+@pytest.mark.asyncio
+async def test_array_accumulator():
+    batches = []
+    release = asyncio.Event()
+
+    async def process(values):
+        assert isinstance(values, memoryview)
+        batches.append(list(values))
+        if len(batches) == 1:
+            await release.wait()
+
+    batched = array_accumulator(3, max_wait=0.02)(process)
+    # the first batch is processed while the second buffer is filled
+    first = asyncio.ensure_future(batched(1, 2, 3))
+    await asyncio.sleep(0)
+    await batched(4, 5, 6)
+    assert batches == [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]
+    # both buffers are busy: filling waits for the first one to be released
+    third = asyncio.ensure_future(batched(7))
+    await asyncio.sleep(0.01)
+    assert not third.done()
+    release.set()
+    await first
+    await third
+    await asyncio.sleep(0.04)
+    assert batches[-1] == [7.0]
+
+    await batched(8, 9)
+    assert await batched.flush() is None
+    assert batches[-1] == [8.0, 9.0]
+    assert await batched.flush() is None
+    with pytest.raises(TypeError):
+        await batched("a")
+
+
+@pytest.mark.asyncio
+async def test_array_accumulator_numpy():
+    numpy = pytest.importorskip("numpy")
+    batches = []
+    batched = array_accumulator(2, typecode="i", use_numpy=True)(batches.append)
+    await batched(1, 2)
+    assert isinstance(batches[0], numpy.ndarray)
+
+
+@pytest.mark.asyncio
+async def test_wire_sync_condition_returning_coroutine():
+    calls = []
+
+    async def never():
+        return False
+
+    for condition in (lambda: never(), never):
+        trigger, listen = wire(condition=condition)
+        listen(calls.append)
+        await trigger(lambda: 1)()
+    assert calls == []
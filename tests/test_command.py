@@ -0,0 +1,71 @@
+import sys
+import pytest
+
+from aiosow.bindings import accumulator
+from aiosow.command import run
+from aiosow.memory import SQLiteMemory, restore
+from aiosow.perpetuate import on, perpetuate, scheduler
+from aiosow.routines import clear_routines
+from aiosow.setup import clear_setups, setup
+
+
+@pytest.fixture
+def composition(tmp_path, monkeypatch):
+    package = tmp_path / "interrupted"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "bindings.py").write_text("")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, "argv", ["aiosow"])
+    clear_setups()
+    clear_routines()
+    yield "interrupted"
+    clear_setups()
+
+
+def test_run_drains_when_interrupted(composition, tmp_path, monkeypatch):
+    path = str(tmp_path / "memory.ckpt")
+    monkeypatch.setattr(sys, "argv", ["aiosow", "--checkpoint", path])
+    batches, debounced, queued = [], [], []
+    collect = accumulator(10)(batches.append)
+    on("interrupted_debounced", debounce=60)(debounced.append)
+    on("interrupted_queued")(queued.append)
+
+    async def produce(memory):
+        for i in range(16):
+            await collect(i)
+        await perpetuate(lambda: {"interrupted_debounced": 1}, memory=memory)
+        scheduler("queue")
+        await perpetuate(lambda: {"interrupted_queued": 2}, memory=memory)
+        raise KeyboardInterrupt
+
+    @setup
+    async def start(memory):
+        return produce(memory)
+
+    try:
+        run(composition)
+    finally:
+        scheduler("recursive")
+    assert sum(batches, []) == list(range(16))
+    assert debounced == [1]
+    assert queued == [2]
+    assert restore(path)["interrupted_queued"] == 2
+
+
+def test_run_drains_on_exit(composition, tmp_path, monkeypatch):
+    path = str(tmp_path / "memory.db")
+    monkeypatch.setattr(sys, "argv", ["aiosow", "--memory_path", path])
+    batches = []
+    collect = accumulator(10)(batches.append)
+
+    @setup
+    async def start():
+        await collect(1)
+        return {"started": True}
+
+    run(composition)
+    assert batches == [[1]]
+    memory = SQLiteMemory(path)
+    assert memory["started"] is True
+    memory.close()
@@ -0,0 +1,163 @@
+import asyncio, time
+import pytest
+
+from aiosow.limiters import AdaptiveLimiter, RateLimiter
+
+
+def test_rate_limiter_reserve():
+    now = [0.0]
+    limiter = RateLimiter(rate=10, burst=3, clock=lambda: now[0])
+    assert [limiter.reserve() for _ in range(3)] == [0, 0, 0]
+    assert limiter.reserve() == pytest.approx(0.1)
+    assert limiter.reserve() == pytest.approx(0.2)
+    now[0] = 10
+    assert limiter.reserve() == 0
+
+    for i in range(1100):
+        limiter.reserve(i)
+    # nothing was stale, so the next prune waits for twice as many keys
+    assert len(limiter.arrivals) == 1101
+    assert limiter.prune_at == 2050
+    now[0] = 20
+    for i in range(1100, 2100):
+        limiter.reserve(i)
+    assert min(limiter.arrivals) == 1100
+    assert limiter.prune_at == 1900
+
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
+    with pytest.raises(ValueError):
+        RateLimiter(rate=1, burst=0)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_fifo_and_shared():
+    # a frozen clock: the slots are spaced by the limiter, not by the timers
+    limiter = RateLimiter(rate=50, clock=lambda: 0.0)
+    starts = []
+
+    @limiter
+    async def first(i):
+        starts.append(i)
+
+    @limiter
+    def second(i):
+        starts.append(i)
+
+    await asyncio.gather(*[(first if i % 2 else second)(i) for i in range(5)])
+    assert starts == list(range(5))
+    # both functions reserved their slots in the same quota
+    assert limiter.arrivals[None] == pytest.approx(5 * 0.02)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_keys():
+    async def user_key(user):
+        return user
+
+    for key in (lambda user: user, user_key, lambda user: user_key(user)):
+        limiter = RateLimiter(rate=1, key=key)
+
+        @limiter
+        def notify(user):
+            return user
+
+        start = time.monotonic()
+        assert await notify("a", memory={}) == "a"
+        assert await notify("b", memory={}) == "b"
+        assert time.monotonic() - start < 0.5
+        assert set(limiter.arrivals) == {"a", "b"}
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_cancel():
+    limiter = RateLimiter(rate=1)
+    await limiter.acquire()
+    reserved = limiter.arrivals[None]
+    task = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert limiter.arrivals[None] == reserved
+
+
+def test_adaptive_limiter_record():
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=2, max_limit=5)
+    for _ in range(4):
+        limiter.record(0.1, failed=False)
+    assert limiter.limit == pytest.approx(5, abs=0.1)
+    for _ in range(10):
+        limiter.record(0.1, failed=False)
+    assert limiter.limit == 5
+    assert limiter.baseline == pytest.approx(0.1)
+    limiter.record(0.05, failed=False)
+    assert limiter.baseline == 0.05
+    limiter.record(0.2, failed=False)  # slow
+    assert limiter.limit == 4.5
+    limiter.record(0.06, failed=True)
+    assert limiter.limit == pytest.approx(4.05)
+    for _ in range(20):
+        limiter.record(0.2, failed=False)
+    assert limiter.limit == 2
+
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(initial_limit=10, max_limit=5)
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_queue():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=2, max_queue=1)
+    running, peak = 0, 0
+    release = asyncio.Event()
+
+    @limiter
+    async def call(i):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+        return i
+
+    tasks = [asyncio.ensure_future(call(i)) for i in range(3)]
+    await asyncio.sleep(0)
+    assert (limiter.inflight, limiter.queued) == (2, 1)
+    with pytest.raises(asyncio.QueueFull):
+        await call(3)
+    assert limiter.rejections == 1
+    release.set()
+    assert await asyncio.gather(*tasks) == [0, 1, 2]
+    assert peak == 2
+    assert (limiter.inflight, limiter.queued) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_errors_and_cancel():
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+
+    @limiter
+    def failing():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        await failing()
+    assert limiter.inflight == 0
+
+    # cancelled while queued
+    await limiter.acquire()
+    waiting = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert limiter.queued == 0
+
+    # cancelled after being given the slot
+    waiting = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    limiter.release()
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert limiter.inflight == 0
@@ -0,0 +1,299 @@
+import asyncio, os, threading, time
+import pytest
+
+from aiosow.memory import (
+    BoundedMemory,
+    SQLiteMemory,
+    checkpoint,
+    restore,
+    checkpoint_periodically,
+    schema,
+)
+from aiosow.perpetuate import perpetuate
+
+
+def test_sqlite_memory(tmp_path):
+    path = str(tmp_path / "memory.db")
+    memory = SQLiteMemory(path, cache_size=2)
+    memory["a"] = 1
+    memory.update({"b": [1, 2], "c": {"d": 3}})
+    assert memory["a"] == 1
+    assert "b" in memory and "z" not in memory
+    assert sorted(memory) == ["a", "b", "c"]
+    assert len(memory) == 3
+    del memory["c"]
+    with pytest.raises(KeyError):
+        memory["c"]
+    with pytest.raises(KeyError):
+        del memory["c"]
+    assert memory.get("z", 0) == 0
+    memory.close()
+
+    memory = SQLiteMemory(path, cache_size=2)
+    assert sorted(memory) == ["a", "b"]
+    assert not memory.cache  # values are loaded when read
+    assert memory["b"] == [1, 2]
+    assert memory["a"] == 1
+    assert memory["b"] == [1, 2]
+    memory["e"] = 4
+    assert list(memory.cache) == ["b", "e"]
+    memory.close()
+
+
+def test_sqlite_memory_write_behind(tmp_path):
+    path = str(tmp_path / "memory.db")
+    memory = SQLiteMemory(path, flush_interval=0.01)
+    memory["a"] = 1
+    memory["lock"] = memory.lock  # can't be pickled
+    del memory["a"]
+    memory["b"] = 2
+    deadline = time.monotonic() + 1
+    while memory.dirty and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not memory.dirty
+    memory.cache.clear()
+    assert memory["lock"] is memory.lock
+    assert memory["b"] == 2
+    memory.close()
+
+    memory = SQLiteMemory(path)
+    assert sorted(memory) == ["b"]
+    memory.close()
+
+
+class Flaky:
+    """Fails to be pickled once, like a value mutated while it's pickled"""
+
+    failures = 1
+
+    def __reduce__(self):
+        if Flaky.failures:
+            Flaky.failures -= 1
+            raise RuntimeError("changed during pickling")
+        return (Flaky, ())
+
+
+def test_sqlite_memory_pickling_errors(tmp_path):
+    path = str(tmp_path / "memory.db")
+    Flaky.failures = 1
+    memory = SQLiteMemory(path, flush_interval=60)
+    memory["a"] = 1
+    memory.flush()
+    memory["a"] = memory.lock
+    memory["b"] = Flaky()
+    memory.flush()
+    memory.cache.clear()
+    assert memory["a"] is memory.lock
+    assert list(memory.dirty) == ["b"]
+    memory.flush()
+    assert not memory.dirty
+    memory.close()
+
+    memory = SQLiteMemory(path)
+    assert memory["a"] == 1
+    assert isinstance(memory["b"], Flaky)
+    memory.close()
+
+
+def test_sqlite_memory_commit_doesnt_block(tmp_path):
+    memory = SQLiteMemory(str(tmp_path / "memory.db"), flush_interval=60)
+    free = []
+
+    def probe(statement):
+        def acquire():
+            if memory.lock.acquire(blocking=False):
+                memory.lock.release()
+                free.append(statement)
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        thread.join()
+
+    memory.writer_connection.set_trace_callback(probe)
+    memory["a"] = 1
+    memory.flush()
+    assert "COMMIT" in free
+    memory.writer_connection.set_trace_callback(None)
+    memory.close()
+
+    memory = SQLiteMemory(":memory:")
+    memory["a"] = 1
+    memory.close()
+
+
+def test_sqlite_memory_pending_reads(tmp_path):
+    memory = SQLiteMemory(str(tmp_path / "memory.db"), cache_size=1)
+    memory["a"] = 1
+    memory["b"] = 2
+    memory.writing, memory.dirty = memory.dirty, {}
+    assert memory["a"] == 1
+    del memory["a"]
+    with pytest.raises(KeyError):
+        memory["a"]
+    memory.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_memory_perpetuate(tmp_path):
+    memory = SQLiteMemory(str(tmp_path / "memory.db"))
+    memory["count"] = 1
+
+    async def increment(count):
+        await asyncio.sleep(0)
+        return {"count": count + 1}
+
+    await perpetuate(increment, memory=memory)
+    assert memory["count"] == 2
+    memory.close()
+
+
+def test_checkpoint(tmp_path):
+    path = str(tmp_path / "memory.ckpt")
+    assert restore(path) == {}
+    memory = {"a": 1, "b": b"x" * 1000, "lock": threading.Lock()}
+    checkpoint(memory, path)
+    assert restore(path) == {"a": 1, "b": b"x" * 1000}
+    assert restore(path, {"c": 2}, use_mmap=False) == {
+        "a": 1,
+        "b": b"x" * 1000,
+        "c": 2,
+    }
+    checkpoint({}, path)
+    assert restore(path) == {}
+
+    with open(path, "wb") as file:
+        file.write(b"not a checkpoint")
+    with pytest.raises(ValueError):
+        restore(path)
+
+
+def test_checkpoint_is_atomic(tmp_path, mocker):
+    path = str(tmp_path / "memory.ckpt")
+    checkpoint({"a": 1}, path)
+    mocker.patch("os.replace", side_effect=OSError("disk"))
+    with pytest.raises(OSError):
+        checkpoint({"a": 2}, path)
+    assert restore(path) == {"a": 1}
+    assert os.listdir(tmp_path) == ["memory.ckpt"]
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_periodically(tmp_path, caplog):
+    path = str(tmp_path / "memory.ckpt")
+    memory = {"a": 1}
+    task = asyncio.ensure_future(checkpoint_periodically(memory, path, 0.01))
+    broken = asyncio.ensure_future(
+        checkpoint_periodically(memory, str(tmp_path / "missing" / "x"), 0.01)
+    )
+    await asyncio.sleep(0.05)
+    task.cancel()
+    broken.cancel()
+    assert restore(path) == {"a": 1}
+    assert "checkpoint to" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_bounded_memory():
+    now = [0]
+    memory = BoundedMemory({"config": 1, 2: "two"}, clock=lambda: now[0])
+    memory.policy("session:*", ttl=10)
+    memory.policy("page:*", max_entries=2)
+    evicted, saved = [], []
+    memory.evicted()(lambda key, value: evicted.append(key))
+
+    @memory.evicted("page:*")
+    async def save(key, value):
+        saved.append((key, value))
+
+    memory["session:a"] = 1
+    now[0] = 5
+    memory["session:b"] = 2
+    now[0] = 8
+    memory["session:a"] = 3  # a write restarts the ttl
+    memory["page:1"] = "p1"
+    memory["page:2"] = "p2"
+    assert memory["page:1"] == "p1"
+    memory["page:3"] = "p3"
+    assert evicted == ["page:2"]
+    assert "page:2" not in memory and "page:1" in memory
+    await asyncio.sleep(0)
+    assert saved == [("page:2", "p2")]
+
+    now[0] = 16
+    assert "session:b" not in memory
+    assert memory["session:a"] == 3
+    now[0] = 17
+    assert len(memory) == 5
+    now[0] = 20
+    assert sorted(memory, key=str) == [2, "config", "page:1", "page:3"]
+    assert evicted == ["page:2", "session:b", "session:a"]
+
+    memory["session:c"] = 1
+    del memory["session:c"]
+    del memory["page:1"]
+    memory["page:4"] = 4
+    assert "page:3" in memory
+
+    memory.policy("config", ttl=1)
+    now[0] = 21
+    assert "config" not in memory
+
+
+@pytest.mark.asyncio
+async def test_bounded_memory_compaction():
+    memory = BoundedMemory()
+    memory.policy("*", ttl=60)
+    for i in range(1000):
+        memory["hot"] = i
+    assert len(memory.expirations) < 100
+    assert memory["hot"] == 999
+
+
+@pytest.mark.asyncio
+async def test_schema():
+    Memory = schema(
+        "Hot", count=(int, 0), users=(list, []), ratio=(int, float), name=None
+    )
+    memory = Memory({"token": "t"})
+    other = Memory()
+    assert memory.count == 0 and memory["count"] == 0
+    assert memory.users is not other.users
+    assert memory.get("ratio", 1.5) == 1.5
+    assert memory.get("token") == "t"
+    assert "ratio" not in memory and "token" in memory
+    with pytest.raises(KeyError):
+        memory["ratio"]
+    assert sorted(memory) == ["count", "token", "users"]
+    assert len(memory) == 3
+    assert "count" in repr(memory)
+
+    async def increment(count):
+        return {"count": count + 1, "name": object(), "ratio": 0.5}
+
+    await perpetuate(increment, memory=memory)
+    assert memory.count == 1 and memory.ratio == 0.5
+    with pytest.raises(TypeError):
+        await perpetuate(lambda: {"count": "1"}, memory=memory)
+    assert memory.count == 1
+    # a rejected mutation is not applied at all
+    with pytest.raises(TypeError):
+        await perpetuate(lambda: {"count": 2, "new": 1, "users": "x"}, memory=memory)
+    assert memory.count == 1 and "new" not in memory
+    memory["count"] = 2
+    memory["new"] = 1
+    assert memory.count == 2 and memory.extra["new"] == 1
+    with pytest.raises(TypeError):
+        memory["count"] = "3"
+    del memory["new"]
+
+    del memory["count"]
+    del memory["token"]
+    with pytest.raises(KeyError):
+        del memory["count"]
+    assert "count" not in memory
+    assert not hasattr(memory, "__dict__")
+
+    with pytest.raises(ValueError):
+        schema(items=list)
+    with pytest.raises(ValueError):
+        schema(**{"page:1": str})
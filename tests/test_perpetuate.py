@@ -1,6 +1,25 @@
+import asyncio, time, json, logging
 import pytest
 
-from aiosow.perpetuate import perpetuate, on
+from aiosow.perpetuate import (
+    perpetuate,
+    on,
+    concurrent_dispatch,
+    detect_changes,
+    get_suppressed,
+    clear_suppressed,
+    scheduler,
+    drain,
+    journal,
+    get_journal,
+    subscribe_journal,
+    dump_journal,
+    JOURNAL_SUBSCRIBERS,
+    ONS,
+    flush_handlers,
+    perpetuate_many,
+    transaction,
+)
 
 
 @pytest.mark.asyncio
@@ -32,3 +51,527 @@ async def test_on(mocker):
     assert mockb.call_count == 2
     with pytest.raises(ValueError):
         await perpetuate(lambda: {"b": 1}, memory=mem)
+
+
+@pytest.mark.asyncio
+async def test_perpetuate_awaits_returned_coroutine():
+    mem = {}
+
+    async def update():
+        return {"awaited": True}
+
+    assert await perpetuate(lambda: update(), memory=mem) == {"awaited": True}
+    assert mem["awaited"]
+
+
+@pytest.mark.asyncio
+async def test_nested_perpetuate():
+    mem = {}
+    on("outer")(lambda memory: perpetuate(lambda: {"inner": True}, memory=memory))
+    await perpetuate(lambda: {"outer": True}, memory=mem)
+    assert mem["inner"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_handlers():
+    order = []
+
+    def slow(name):
+        async def handler():
+            await asyncio.sleep(0.1)
+            order.append(name)
+
+        return handler
+
+    on("concurrent_a", concurrent=True)(slow("first"))
+    on("concurrent_a", concurrent=True)(slow("second"))
+    on("concurrent_b")(lambda: order.append("sequential"))
+    start_time = time.monotonic()
+    await perpetuate(lambda: {"concurrent_a": 1, "concurrent_b": 1}, memory={})
+    assert time.monotonic() - start_time < 0.2
+    assert order == ["sequential", "first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_dispatch_setting():
+    calls = []
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        calls.append(1)
+
+    for _ in range(3):
+        on("bounded")(slow)
+    on("bounded", concurrent=False)(lambda: calls.append(0))
+    try:
+        concurrent_dispatch(max_concurrency=1)
+        start_time = time.monotonic()
+        await perpetuate(lambda: {"bounded": True}, memory={})
+        assert time.monotonic() - start_time >= 0.15
+        concurrent_dispatch()
+        start_time = time.monotonic()
+        await perpetuate(lambda: {"bounded": True}, memory={})
+        assert time.monotonic() - start_time < 0.1
+        assert calls == [0, 1, 1, 1] * 2
+    finally:
+        concurrent_dispatch(False)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_handler_errors():
+    finished = []
+
+    async def failing():
+        raise KeyError("concurrent")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+
+    on("failing_concurrent", concurrent=True)(failing)
+    on("failing_concurrent", concurrent=True)(slow)
+    with pytest.raises(KeyError):
+        await perpetuate(lambda: {"failing_concurrent": True}, memory={})
+    assert finished == [1]
+
+    def failing_sequential():
+        raise ValueError("sequential")
+
+    on("failing_sequential", concurrent=True)(slow)
+    on("failing_sequential")(failing_sequential)
+    with pytest.raises(ValueError):
+        await perpetuate(lambda: {"failing_sequential": True}, memory={})
+    await asyncio.sleep(0.1)
+    assert finished == [1]
+
+
+@pytest.mark.asyncio
+async def test_singularize_bounded():
+    in_flight, peak, produced, processed = 0, 0, 0, []
+
+    def elements():
+        nonlocal produced
+        for i in range(10):
+            produced += 1
+            # elements are pulled lazily, one chunk per worker at most
+            assert produced - len(processed) <= 2 * 3
+            yield i
+
+    async def handler(element):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        processed.append(element)
+
+    on("streamed", singularize=True, max_concurrency=2, chunk_size=3)(handler)
+    await perpetuate(lambda: {"streamed": elements()}, memory={})
+    assert sorted(processed) == list(range(10))
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_singularize_async_iterator():
+    processed = []
+
+    async def elements():
+        for i in range(5):
+            await asyncio.sleep(0)
+            yield i
+
+    on("async_streamed", singularize=True, max_concurrency=3, chunk_size=2)(
+        processed.append
+    )
+    on("async_gathered", singularize=True)(processed.append)
+    await perpetuate(lambda: {"async_streamed": elements()}, memory={})
+    assert sorted(processed) == list(range(5))
+    await perpetuate(lambda: {"async_gathered": elements()}, memory={})
+    assert sorted(processed) == sorted(list(range(5)) * 2)
+    await perpetuate(lambda: {"async_streamed": {"key": "value"}}, memory={})
+    assert processed[-1] == ("key", "value")
+
+
+@pytest.mark.asyncio
+async def test_singularize_bounded_errors():
+    closed = []
+
+    async def elements():
+        try:
+            for i in range(100):
+                yield i
+        finally:
+            closed.append(True)
+
+    async def handler(element):
+        await asyncio.sleep(0.01)
+        if element == 3:
+            raise ValueError(element)
+
+    on("failing_stream", singularize=True, max_concurrency=2)(handler)
+    with pytest.raises(ValueError):
+        await perpetuate(lambda: {"failing_stream": elements()}, memory={})
+    assert closed == [True]
+    with pytest.raises(ValueError):
+        on("unbounded_chunks", singularize=True, chunk_size=2)
+
+
+@pytest.mark.asyncio
+async def test_detect_changes():
+    clear_suppressed()
+    calls = []
+    shared = [1]
+    for name in ("by_identity", "by_equality", "by_digest", "undetected"):
+        on(name)(lambda value, name=name: calls.append(name))
+        on(name)(lambda: None)
+    detect_changes("by_identity", "identity")
+    detect_changes("by_equality")
+    detect_changes("by_digest", lambda value: tuple(value))
+    mem = {}
+
+    await perpetuate(lambda: {"by_identity": shared, "by_equality": [1]}, memory=mem)
+    await perpetuate(lambda: {"by_identity": shared, "by_equality": [1]}, memory=mem)
+    await perpetuate(lambda: {"by_identity": [1], "by_equality": [2]}, memory=mem)
+    assert calls == ["by_identity", "by_equality", "by_identity", "by_equality"]
+    assert get_suppressed() == {"by_identity": 2, "by_equality": 2}
+
+    calls.clear()
+    await perpetuate(lambda: {"by_digest": shared, "undetected": 1}, memory=mem)
+    await perpetuate(lambda: {"by_digest": shared, "undetected": 1}, memory=mem)
+    shared.append(2)
+    await perpetuate(lambda: {"by_digest": shared}, memory=mem)
+    assert calls == ["by_digest", "undetected", "undetected", "by_digest"]
+    assert get_suppressed()["by_digest"] == 2
+
+    clear_suppressed()
+    assert get_suppressed() == {}
+    with pytest.raises(ValueError):
+        detect_changes("by_identity", "unknown")
+
+
+@pytest.mark.asyncio
+async def test_queue_scheduler():
+    calls = []
+    on("queued")(lambda queued: calls.append(queued))
+    on("queued_depth")(
+        lambda queued_depth: {"queued_depth": queued_depth + 1}
+        if queued_depth < 3000
+        else {"queued": "deep"}
+    )
+    try:
+        scheduler("queue", workers=2)
+        mem = {}
+        await perpetuate(lambda: {"queued": 1}, memory=mem)
+        assert calls == []
+        await drain()
+        assert calls == [1]
+        # deep cascades don't nest
+        await perpetuate(lambda: {"queued_depth": 0}, memory=mem)
+        await drain()
+        assert mem["queued_depth"] == 3000 and calls == [1, "deep"]
+    finally:
+        scheduler("recursive")
+    await drain()
+
+
+@pytest.mark.asyncio
+async def test_queue_scheduler_backpressure():
+    calls = []
+
+    async def slow(backpressure):
+        await asyncio.sleep(0.05)
+        calls.append(backpressure)
+
+    on("backpressure")(slow)
+    try:
+        scheduler("queue", workers=1, queue_size=1)
+        start_time = time.monotonic()
+        for i in range(4):
+            await perpetuate(lambda i=i: {"backpressure": i}, memory={})
+        assert time.monotonic() - start_time >= 0.1
+        await drain()
+        assert calls == [0, 1, 2, 3]
+    finally:
+        scheduler("recursive")
+
+
+@pytest.mark.asyncio
+async def test_queue_scheduler_overflow_and_errors():
+    calls = []
+
+    async def spawn(overflowing, memory):
+        for i in range(overflowing):
+            await perpetuate(lambda i=i: {"overflowing_leaf": i}, memory=memory)
+
+    async def leaf(overflowing_leaf):
+        await asyncio.sleep(0.01)
+        calls.append(overflowing_leaf)
+
+    on("overflowing")(spawn)
+    on("overflowing_leaf")(leaf)
+    on("overflowing_error")(lambda: 1 / 0)
+    try:
+        scheduler("queue", workers=1, queue_size=1)
+        mem = {}
+        await perpetuate(lambda: {"overflowing_error": True}, memory=mem)
+        await perpetuate(lambda: {"overflowing": 5}, memory=mem)
+        await drain()
+        assert sorted(calls) == list(range(5))
+        with pytest.raises(ValueError):
+            scheduler("unknown")
+        with pytest.raises(ValueError):
+            scheduler("queue", workers=0)
+        with pytest.raises(ValueError):
+            scheduler("queue", queue_size=0)
+    finally:
+        scheduler("recursive")
+
+
+@pytest.mark.asyncio
+async def test_journal(caplog):
+    subscribed = []
+    journal(2)
+    try:
+
+        def journaled(value):
+            return {"journaled": [value], "count": value}
+
+        await perpetuate(journaled, args=[1], memory={})
+        await perpetuate(journaled, args=[2], memory={})
+        await perpetuate(journaled, args=[3], memory={})
+        entries = get_journal()
+        assert len(entries) == 2
+        assert entries[-1].source == "journaled"
+        assert entries[-1].keys == ("journaled", "count")
+        assert entries[-1].sizes == (1, None)
+        assert json.loads(dump_journal())[-1]["keys"] == ["journaled", "count"]
+
+        journal(0)
+        await perpetuate(journaled, args=[4], memory={})
+        assert get_journal() == []
+        subscribe_journal(subscribed.append)
+        with caplog.at_level(logging.DEBUG):
+            await perpetuate(journaled, args=[4], memory={})
+        assert get_journal() == []
+        assert subscribed[-1].keys == ("journaled", "count")
+        assert '"count": 4' in caplog.text
+    finally:
+        journal()
+        JOURNAL_SUBSCRIBERS.clear()
+
+
+@pytest.mark.asyncio
+async def test_journal_errors(caplog):
+    class Unsized:
+        def __len__(self):
+            raise TypeError("no size")
+
+    def failing(mutation):
+        raise ValueError("subscriber")
+
+    subscribe_journal(failing)
+    try:
+        memory = {}
+        await perpetuate(lambda: {"unsized": Unsized(), "sized": [1]}, memory=memory)
+        assert isinstance(memory["unsized"], Unsized)
+        assert get_journal()[-1].sizes == (None, 1)
+        assert "journal subscriber" in caplog.text
+    finally:
+        JOURNAL_SUBSCRIBERS.clear()
+
+
+@pytest.mark.asyncio
+async def test_debounce():
+    latest, accumulated = [], []
+    on("debounced", debounce=0.05)(latest.append)
+    on("debounced", debounce=0.05, accumulate=True)(accumulated.append)
+    mem = {}
+    for i in range(5):
+        await perpetuate(lambda i=i: {"debounced": i}, memory=mem)
+    assert latest == accumulated == []
+    await asyncio.sleep(0.1)
+    assert latest == [4]
+    assert accumulated == [[0, 1, 2, 3, 4]]
+
+    with pytest.raises(ValueError):
+        on("debounced", max_latency=1)
+    with pytest.raises(ValueError):
+        on("debounced", accumulate=True)
+
+
+@pytest.mark.asyncio
+async def test_debounce_max_latency():
+    calls = []
+    on("bursting", debounce=0.05, max_latency=0.1)(calls.append)
+    mem = {}
+    start = time.monotonic()
+    while time.monotonic() - start < 0.3:
+        await perpetuate(lambda: {"bursting": time.monotonic()}, memory=mem)
+        await asyncio.sleep(0.01)
+    assert 2 <= len(calls) <= 4
+    await flush_handlers()
+
+
+@pytest.mark.asyncio
+async def test_flush_handlers(caplog):
+    calls = []
+    on("flushed", debounce=10)(calls.append)
+    on("flushed_error", debounce=10)(lambda flushed_error: 1 / 0)
+    mem = {}
+    await perpetuate(lambda: {"flushed": 1, "flushed_error": 1}, memory=mem)
+    await flush_handlers()
+    assert calls == [1]
+    assert "deferred call" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_coalesce():
+    latest, accumulated = [], []
+
+    async def slow(coalesced):
+        await asyncio.sleep(0.02)
+        latest.append(coalesced)
+
+    on("coalesced", coalesce=True, concurrent=True)(slow)
+    on("coalesced", coalesce=True, accumulate=True)(accumulated.append)
+    mem = {}
+    await asyncio.gather(
+        *[perpetuate(lambda i=i: {"coalesced": i}, memory=mem) for i in range(5)]
+    )
+    assert latest == [0, 4]
+    assert sum(accumulated, []) == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_deferred_values_are_held_per_memory():
+    debounced, coalesced = [], []
+
+    def collect(calls):
+        def handler(value, memory):
+            calls.append((memory["name"], value))
+
+        return handler
+
+    async def slow(value, memory):
+        await asyncio.sleep(0.01)
+        collect(coalesced)(value, memory)
+
+    on("debounced_per_memory", debounce=0.02)(collect(debounced))
+    on("coalesced_per_memory", coalesce=True, concurrent=True)(slow)
+    first, second = {"name": "first"}, {"name": "second"}
+    for key in ("debounced_per_memory", "coalesced_per_memory"):
+        await asyncio.gather(
+            perpetuate(lambda key=key: {key: 1}, memory=first),
+            perpetuate(lambda key=key: {key: 2}, memory=second),
+        )
+    await asyncio.sleep(0.05)
+    assert sorted(debounced) == sorted(coalesced) == [("first", 1), ("second", 2)]
+    for key in ("debounced_per_memory", "coalesced_per_memory"):
+        assert not ONS[key][0]["states"]
+
+
+@pytest.mark.asyncio
+async def test_batch():
+    batches, waited = [], []
+    on("batched", batch_size=3)(batches.append)
+    on("batched", batch_size=lambda memory: memory["size"], max_wait=0.05)(
+        waited.append
+    )
+    mem = {"size": 4}
+    for i in range(7):
+        await perpetuate(lambda i=i: {"batched": i}, memory=mem)
+    assert batches == [[0, 1, 2], [3, 4, 5]]
+    assert waited == [[0, 1, 2, 3]]
+    await asyncio.sleep(0.1)
+    assert waited == [[0, 1, 2, 3], [4, 5, 6]]
+    await flush_handlers()
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+    with pytest.raises(ValueError):
+        on("batched", max_wait=1)
+    with pytest.raises(ValueError):
+        on("batched", batch_size=2, debounce=1)
+
+
+@pytest.mark.asyncio
+async def test_perpetuate_many():
+    seen = []
+    on("staged_a")(lambda staged_a, memory: seen.append((staged_a, memory["staged_b"])))
+    on("staged_b")(lambda staged_b: seen.append(staged_b))
+    mem = {}
+
+    def first():
+        return {"staged_a": 1, "staged_b": 1}
+
+    def second(increment, staged_a):
+        return {"staged_b": staged_a + increment}
+
+    update = await perpetuate_many(
+        first, (second, [10]), lambda: None, memory=mem
+    )
+    assert update == {"staged_a": 1, "staged_b": 11}
+    assert mem == update
+    assert seen == [(1, 11), 11]
+
+
+@pytest.mark.asyncio
+async def test_transaction():
+    seen = []
+    on("transacted")(seen.append)
+    mem = {"transacted": 0}
+    with pytest.raises(ZeroDivisionError):
+        async with transaction(mem) as staged:
+            await staged.perpetuate(lambda: {"transacted": 1})
+            assert staged.memory["transacted"] == 1
+            1 / 0
+    assert mem == {"transacted": 0}
+    assert seen == []
+
+    async def increment(transacted):
+        return {"transacted": transacted + 1}
+
+    async with transaction(mem) as staged:
+        for _ in range(3):
+            await staged.perpetuate(increment)
+        assert mem["transacted"] == 0
+    assert mem["transacted"] == 3
+    assert seen == [3]
+    async with transaction(mem):
+        pass
+    assert seen == [3]
+
+
+@pytest.mark.asyncio
+async def test_sync_condition_returning_coroutine():
+    calls = []
+
+    async def is_big(value):
+        return value > 10
+
+    on("sync_conditioned", condition=lambda value: is_big(value))(calls.append)
+    on("sync_conditioned", condition=is_big)(calls.append)
+    mem = {}
+    await perpetuate(lambda: {"sync_conditioned": 1}, memory=mem)
+    await perpetuate(lambda: {"sync_conditioned": 11}, memory=mem)
+    assert calls == [11, 11]
+
+
+@pytest.mark.asyncio
+async def test_singularize_error_while_generator_suspended():
+    closed = []
+
+    async def elements():
+        try:
+            for i in range(100):
+                await asyncio.sleep(0.001)
+                yield i
+        finally:
+            closed.append(True)
+
+    async def handler(element):
+        raise ValueError(element)
+
+    on("suspended_stream", singularize=True, max_concurrency=3)(handler)
+    with pytest.raises(ValueError):
+        await perpetuate(lambda: {"suspended_stream": elements()}, memory={})
+    assert closed == [True]
@@ -78,3 +78,15 @@ async def test_infinite_generator():
     assert await generator_consumer() == 1
     assert await generator_consumer() == 2
     assert await generator_consumer() == 1
+
+
+@pytest.mark.asyncio
+async def test_routine_sync_condition_returning_coroutine():
+    async def never():
+        return False
+
+    routine(0.2, condition=lambda: never())(lambda: {"test": "test"})
+    routine(0.2, condition=never)(lambda: {"test": "test"})
+    memory = {}
+    await consume_routines(memory=memory)
+    assert "test" not in memory
@@ -0,0 +1,111 @@
+import asyncio, ctypes, os, time
+import pytest
+from array import array
+
+from aiosow.autofill import make_async, executor, shutdown_executors
+from aiosow.perpetuate import perpetuate
+from aiosow.shared import DIRECTORY, SharedBuffer, share, attach, call_shared
+
+
+def checksum(data, **kwargs):
+    """Module level to be sent to a process pool"""
+    return type(data).__name__, sum(data), kwargs
+
+
+def doubled(data):
+    """Module level to be sent to a process pool"""
+    return {"doubled": bytes(data) * 2}
+
+
+def large(size):
+    """Module level to be sent to a process pool"""
+    return bytes(range(256)) * (size // 256)
+
+
+def failing(data):
+    """Module level to be sent to a process pool"""
+    raise ValueError(len(data))
+
+
+def slow_doubled(data):
+    """Module level to be sent to a process pool"""
+    time.sleep(0.2)
+    return bytes(data) * 2
+
+
+def leftovers():
+    return [name for name in os.listdir(DIRECTORY) if name.startswith("aiosow-")]
+
+
+def test_share():
+    assert share(b"small") == b"small"
+    assert share({"not": "a buffer"}) == {"not": "a buffer"}
+    assert share(memoryview(b"abcd")[::2], threshold=1) == memoryview(b"abcd")[::2]
+    shared = share(array("d", [1.0, 2.0]), threshold=1)
+    assert isinstance(shared, SharedBuffer) and shared.size == 16
+    assert attach(shared, unlink=True) == array("d", [1.0, 2.0])
+    assert not os.path.exists(shared.path)
+    assert attach("unchanged") == "unchanged"
+
+    matrix = memoryview(array("i", range(6))).cast("B").cast("i", [2, 3])
+    view = attach(share(matrix, threshold=1), unlink=True)
+    assert view.format == "i" and view.tolist() == [[0, 1, 2], [3, 4, 5]]
+    for value in (b"text", bytearray(b"text")):
+        restored = attach(share(value, threshold=1), unlink=True)
+        assert type(restored) is type(value) and restored.decode() == "text"
+    # a format a memoryview can't be cast to is pickled
+    unsupported = memoryview((ctypes.c_int * 2)())
+    assert share(unsupported, threshold=1) is unsupported
+
+
+def test_call_shared():
+    shared = share(b"\x01" * 10, threshold=1)
+    result = call_shared(large, [], {"size": 512}, threshold=1)
+    assert bytes(attach(result, unlink=True)) == bytes(range(256)) * 2
+    assert call_shared(checksum, [shared], {}, threshold=1) == ("bytes", 10, {})
+    result = call_shared(doubled, [shared], {}, threshold=1)["doubled"]
+    assert bytes(attach(result, unlink=True)) == b"\x01" * 20
+    os.unlink(shared.path)
+
+
+@pytest.mark.asyncio
+async def test_make_async_shared():
+    executor("shared", max_workers=1, processes=True)
+    data = bytes(1 << 16)
+    memory = {"data": data}
+    assert await make_async(executor="shared", shared=True)(checksum)(
+        memory=memory
+    ) == ("bytes", 0, {})
+    assert await make_async(executor="shared", shared=1 << 20)(checksum)(
+        memory=memory
+    ) == ("bytes", 0, {})
+    assert await make_async(executor="shared", shared=8)(checksum)(
+        array("d", [1.5] * 10)
+    ) == ("array", 15.0, {})
+    result = await make_async(executor="shared", shared=True)(large)(1 << 16)
+    assert isinstance(result, bytes) and result[:3] == b"\x00\x01\x02"
+    await perpetuate(
+        make_async(executor="shared", shared=True)(doubled), memory=memory
+    )
+    assert isinstance(memory["doubled"], bytes)
+    assert len(memory["doubled"]) == 1 << 17
+    assert leftovers() == []
+    shutdown_executors()
+
+
+@pytest.mark.asyncio
+async def test_make_async_shared_cancelled():
+    executor("cancelled", max_workers=1, processes=True)
+    call = make_async(executor="cancelled", shared=8)(slow_doubled)
+    with pytest.raises(ValueError):
+        await make_async(executor="cancelled", shared=8)(failing)(b"\x00" * 8)
+    for delay in (0, 0.1):  # cancelled before, then while it runs
+        task = asyncio.ensure_future(call(b"\x01" * 1024))
+        await asyncio.sleep(delay)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    # the single worker runs it once the cancelled calls are done
+    assert await make_async(executor="cancelled")(checksum)(b"") == ("bytes", 0, {})
+    assert leftovers() == []
+    shutdown_executors()